@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+# pymysql日期时间转换函数的微基准测试
+# 对比服务端发送的标准格式(快速路径)和需要正则解析的格式(回退路径)的耗时
+
+import timeit
+
+from pymysql import converters
+
+CASES = [
+    # (转换函数, 快速路径的输入, 走正则回退的输入)
+    (converters.convert_datetime, "2024-01-02 03:04:05", "2024-01-02T03:04:05"),
+    (converters.convert_datetime, "2024-01-02 03:04:05.123456", "2024-01-02T03:04:05.123456"),
+    (converters.convert_timedelta, "12:34:56", "12:34:56 "),
+    (converters.convert_timedelta, "-838:59:59.000001", "-838:59:59.000001 "),
+    (converters.convert_date, "2024-01-02", "2024-1-2"),
+]
+
+
+def bench(func, value, number):
+    # 取多次运行的最小值，减少其他进程的干扰
+    return min(timeit.repeat(lambda: func(value), number=number, repeat=5)) / number * 1e9
+
+
+if __name__ == "__main__":
+    number = 200000
+    print(f"{'converter':<20}{'input':<30}{'fast ns':>10}{'regex ns':>10}{'speedup':>9}")
+    for func, fast_value, slow_value in CASES:
+        assert func(fast_value) == func(slow_value), (fast_value, slow_value)
+        fast = bench(func, fast_value, number)
+        slow = bench(func, slow_value, number)
+        print(f"{func.__name__:<20}{fast_value:<30}{fast:>10.0f}{slow:>10.0f}{slow / fast:>8.1f}x")
@@ -2,6 +2,10 @@
 # http://dev.mysql.com/doc/internals/en/client-server-protocol.html
 # Error codes:
 # https://dev.mysql.com/doc/refman/5.5/en/error-handling.html
+from array import array
+from collections import OrderedDict
+from collections.abc import Sequence
+import datetime
 import errno
 import os
 import socket
@@ -9,11 +13,12 @@ import struct
 import sys
 import traceback
 import warnings
+import zlib
 
 from . import _auth
 
 from .charset import charset_by_name, charset_by_id
-from .constants import CLIENT, COMMAND, CR, FIELD_TYPE, SERVER_STATUS
+from .constants import CLIENT, COMMAND, CR, FIELD_TYPE, FLAG, SERVER_STATUS
 from . import converters
 from .cursors import Cursor
 from .optionfile import Parser
@@ -35,6 +40,11 @@ except ImportError:
     ssl = None
     SSL_ENABLED = False
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 try:
     import getpass
 
@@ -58,11 +68,70 @@ TEXT_TYPES = {
     FIELD_TYPE.GEOMETRY,
 }
 
+# Typecodes of the array.array the columnar reader decodes these integer and
+# floating point types into (signed, unsigned), instead of a list.
+ARRAY_TYPECODES = {
+    FIELD_TYPE.TINY: ("q", "q"),
+    FIELD_TYPE.SHORT: ("q", "q"),
+    FIELD_TYPE.INT24: ("q", "q"),
+    FIELD_TYPE.LONG: ("q", "q"),
+    FIELD_TYPE.LONGLONG: ("q", "Q"),
+    FIELD_TYPE.YEAR: ("q", "q"),
+    FIELD_TYPE.FLOAT: ("d", "d"),
+    FIELD_TYPE.DOUBLE: ("d", "d"),
+}
+
+# Short string types whose values are interned by the columnar reader.
+INTERNED_TYPES = {
+    FIELD_TYPE.ENUM,
+    FIELD_TYPE.STRING,
+    FIELD_TYPE.VAR_STRING,
+    FIELD_TYPE.VARCHAR,
+}
+
 
 DEFAULT_CHARSET = "utf8mb4"
 
 MAX_PACKET_LEN = 2 ** 24 - 1
 
+# Size of the receive buffer filled by recv_into(). Several small packets
+# (rows of a catalog query) usually arrive in one chunk and are returned
+# from memory without touching the socket again.
+RECV_BUFFER_SIZE = 256 * 1024
+
+# Marks the socket timeout as unknown (e.g. socket passed to connect()).
+_TIMEOUT_UNSET = object()
+
+# Payloads shorter than this are sent uncompressed with the compressed
+# protocol, like libmysqlclient does.
+MIN_COMPRESS_LENGTH = 50
+
+# Default zstd level, sent to the server in the handshake response.
+DEFAULT_ZSTD_LEVEL = 3
+
+# Connection.query_pipeline() waits for the results after this many bytes of
+# queries, well below usual socket buffer sizes.
+PIPELINE_BATCH_SIZE = 64 * 1024
+
+
+def _reserve_buffer(buf, view, start, end, num_bytes):
+    """Make room for 'num_bytes' bytes after the unread data buf[start:end].
+
+    Returns the buffer (a new one when it has to grow, or shrink back once a
+    big packet was consumed), its memoryview and the new start and end.
+    """
+    pending = end - start
+    size = len(buf)
+    if num_bytes > size or (pending == 0 and size > RECV_BUFFER_SIZE):
+        buf = bytearray(max(num_bytes, RECV_BUFFER_SIZE))
+        buf[:pending] = view[start:end]
+        return buf, memoryview(buf), 0, pending
+    if start + num_bytes > size:
+        # Move the partial packet to the front of the buffer.
+        buf[:pending] = bytes(view[start:end])
+        return buf, view, 0, pending
+    return buf, view, start, end
+
 
 def _pack_int24(n):
     return struct.pack("<I", n)[:3]
@@ -89,6 +158,534 @@ def _lenenc_int(i):
         )
 
 
+def _read_long_field(data, pos):
+    """Read a length coded string whose length takes more than one byte.
+
+    Returns the position after the field and the field bytes.
+    """
+    c = data[pos]
+    if c == 252:
+        length = struct.unpack_from("<H", data, pos + 1)[0]
+        pos += 3
+    elif c == 253:
+        low, high = struct.unpack_from("<HB", data, pos + 1)
+        length = low + (high << 16)
+        pos += 4
+    else:
+        length = struct.unpack_from("<Q", data, pos + 1)[0]
+        pos += 9
+    return pos + length, data[pos : pos + length]
+
+
+def _long_field_span(data, pos):
+    """Like _read_long_field(), but return the start and end of the field."""
+    c = data[pos]
+    if c == 252:
+        start = pos + 3
+        return start, start + struct.unpack_from("<H", data, pos + 1)[0]
+    if c == 253:
+        low, high = struct.unpack_from("<HB", data, pos + 1)
+        return pos + 4, pos + 4 + low + (high << 16)
+    return pos + 9, pos + 9 + struct.unpack_from("<Q", data, pos + 1)[0]
+
+
+def _row_end(pos, n, row):
+    """Return a (possibly truncated) row, checking the packet was not overrun."""
+    if pos > n:
+        raise AssertionError(
+            "Result length not requested length:\n"
+            "Position: %s.  Data Length: %s" % (pos, n)
+        )
+    return row
+
+
+# int() and float() accept ASCII bytes, so these converters skip the decode.
+_BYTES_CONVERTERS = (int, float)
+
+_row_decoders = {}
+
+
+def _make_row_decoder(converters, columnar=False, interned=(), typed=()):
+    """Compile a function decoding a text protocol row for 'converters'.
+
+    'converters' is the list of (encoding, converter) pairs built by
+    MySQLResult._get_descriptions().  The generated function takes the packet
+    payload and returns the row tuple, with the per column encoding and
+    converter checks resolved once instead of for every value.  A row with
+    fewer columns than the result set is returned truncated, like
+    MySQLResult._read_row_from_packet() does.
+
+    It is called as decode_row(data, pos=0, n=-1, view=None): the payload
+    may also be data[pos:n] of a bytearray, with 'view' a memoryview of it,
+    so that a row is decoded in place in the receive buffer.  Only the values
+    are copied out of it (as bytes, or as str for the encoded columns).
+
+    With 'columnar', a factory is returned instead: it takes one append
+    callable per column and returns a decode function that appends every
+    value to its column (None for the columns missing from a truncated row).
+    The string values of the column indexes in 'interned' are interned.
+    The column indexes in 'typed' are appended to typed arrays, which cannot
+    hold None or out of range values: the factory takes one more callable
+    per typed column, called with the values the array refused.
+    """
+    key = (tuple(converters), columnar, tuple(interned), tuple(typed))
+    decoder = _row_decoders.get(key)
+    if decoder is not None:
+        return decoder
+
+    namespace = {
+        "_long_field_span": _long_field_span,
+        "_row_end": _row_end,
+        "_intern": sys.intern,
+    }
+    count = len(converters)
+    indent = "        " if columnar else "    "
+    signature = "decode_row(data, pos=0, n=-1, view=None):"
+    if columnar:
+        appends = ["append%d" % i for i in range(count)]
+        appends += ["other%d" % i for i in typed]
+        lines = ["def make_decoder(%s):" % ", ".join(appends), "    def " + signature]
+    else:
+        lines = ["def " + signature]
+    lines += [
+        indent + "if n < 0:",
+        indent + "    n = len(data)",
+        indent + "if view is None:",
+        indent + "    view = data",
+    ]
+    names = []
+    for i, (encoding, converter) in enumerate(converters):
+        if converter in _BYTES_CONVERTERS and encoding in (None, "ascii"):
+            # int() and float() also take the bytearray slice.
+            value = "data[start:end]"
+        elif encoding is not None:
+            value = "data[start:end].decode(%r)" % encoding
+        else:
+            value = "bytes(view[start:end])"
+        if converter is not None:
+            namespace["conv%d" % i] = converter
+            value = "conv%d(%s)" % (i, value)
+        elif encoding is not None and i in interned:
+            value = "_intern(%s)" % value
+        v = "v%d" % i
+        if columnar:
+            truncated = ["_row_end(pos, n, None)"]
+            truncated += [
+                "other%d(None)" % j if j in typed else "append%d(None)" % j
+                for j in range(i, count)
+            ]
+            truncated.append("return")
+        else:
+            truncated = [
+                "return _row_end(pos, n, (%s))" % "".join(x + "," for x in names)
+            ]
+        body = ["if pos >= n:"]
+        body += ["    " + line for line in truncated]
+        body += [
+            "c = data[pos]",
+            "if c < 251:",
+            "    start = pos + 1",
+            "    pos = end = start + c",
+            "    %s = %s" % (v, value),
+            "elif c == 251:",
+            "    pos += 1",
+            "    %s = None" % v,
+            "else:",
+            "    start, end = _long_field_span(data, pos)",
+            "    pos = end",
+            "    %s = %s" % (v, value),
+        ]
+        if columnar and i in typed:
+            body += [
+                "try:",
+                "    append%d(%s)" % (i, v),
+                "except (TypeError, OverflowError):",
+                "    other%d(%s)" % (i, v),
+            ]
+        elif columnar:
+            body.append("append%d(%s)" % (i, v))
+        lines += [indent + line for line in body]
+        names.append(v)
+    if columnar:
+        lines += [indent + "_row_end(pos, n, None)", "    return decode_row"]
+    else:
+        lines.append(
+            "    return _row_end(pos, n, (%s))" % "".join(x + "," for x in names)
+        )
+    exec("\n".join(lines), namespace)
+    decoder = namespace["make_decoder" if columnar else "decode_row"]
+    if len(_row_decoders) >= 256:
+        _row_decoders.clear()
+    _row_decoders[key] = decoder
+    return decoder
+
+
+_row_scanners = {}
+
+
+def _make_row_scanner(count):
+    """Compile a function returning the value offsets of a text protocol row.
+
+    The generated function takes the packet payload and returns a flat tuple
+    of (start, end) pairs, one per column, with a start of -1 for NULL.  A
+    row with fewer than 'count' columns gets fewer pairs.
+    """
+    scanner = _row_scanners.get(count)
+    if scanner is not None:
+        return scanner
+
+    lines = ["def scan_row(data):", "    n = len(data)", "    pos = 0"]
+    names = []
+    for i in range(count):
+        start, end = "s%d" % i, "e%d" % i
+        body = [
+            "if pos >= n:",
+            "    return _row_end(pos, n, (%s))" % "".join(x + "," for x in names),
+            "c = data[pos]",
+            "if c < 251:",
+            "    %s = pos + 1" % start,
+            "    pos = %s = %s + c" % (end, start),
+            "elif c == 251:",
+            "    pos += 1",
+            "    %s = %s = -1" % (start, end),
+            "else:",
+            "    %s, %s = _long_field_span(data, pos)" % (start, end),
+            "    pos = %s" % end,
+        ]
+        lines += ["    " + line for line in body]
+        names += [start, end]
+    lines.append(
+        "    return _row_end(pos, n, (%s))" % "".join(x + "," for x in names)
+    )
+    namespace = {"_long_field_span": _long_field_span, "_row_end": _row_end}
+    exec("\n".join(lines), namespace)
+    scanner = _row_scanners[count] = namespace["scan_row"]
+    return scanner
+
+
+# Marks the values of a LazyRow that were not decoded yet.
+_NOT_DECODED = object()
+
+
+class LazyRow(Sequence):
+    """A result row decoding its values on first access.
+
+    Keeps the packet payload and the value offsets; a value is decoded and
+    converted when it is read, then cached.  Compares equal to the tuple of
+    its values, and is pickled as that tuple.
+    """
+
+    __slots__ = ("_data", "_offsets", "_columns", "_values")
+
+    def __init__(self, data, offsets, columns):
+        self._data = data
+        self._offsets = offsets
+        # (encoding, converter) per column, see _make_lazy_row_decoder()
+        self._columns = columns
+        self._values = [_NOT_DECODED] * (len(offsets) >> 1)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __getitem__(self, index):
+        values = self._values
+        if isinstance(index, slice):
+            return tuple([self[i] for i in range(*index.indices(len(values)))])
+        value = values[index]
+        if value is _NOT_DECODED:
+            if index < 0:
+                index += len(values)
+            value = values[index] = self._decode(index)
+        return value
+
+    def __iter__(self):
+        for i in range(len(self._values)):
+            yield self[i]
+
+    def _decode(self, index):
+        start = self._offsets[index * 2]
+        if start < 0:
+            return None
+        value = self._data[start : self._offsets[index * 2 + 1]]
+        encoding, converter = self._columns[index]
+        if encoding is not None:
+            value = value.decode(encoding)
+        if converter is not None:
+            value = converter(value)
+        return value
+
+    def __eq__(self, other):
+        if isinstance(other, (tuple, LazyRow)):
+            return tuple(self) == tuple(other)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __reduce__(self):
+        return tuple, (tuple(self),)
+
+    def __repr__(self):
+        return "LazyRow(%r)" % (tuple(self),)
+
+
+def _make_lazy_row_decoder(converters):
+    """Return a function making a LazyRow of a text protocol row.
+
+    Like _make_row_decoder(), the encoding is dropped up front for the
+    converters taking ASCII bytes.
+    """
+    columns = [
+        (
+            None if encoding == "ascii" and converter in _BYTES_CONVERTERS else encoding,
+            converter,
+        )
+        for encoding, converter in converters
+    ]
+    scan_row = _make_row_scanner(len(columns))
+
+    def decode_row(data):
+        return LazyRow(data, scan_row(data), columns)
+
+    return decode_row
+
+
+# struct formats of the fixed size binary protocol values (signed, unsigned)
+_BINARY_FORMATS = {
+    FIELD_TYPE.TINY: ("<b", "<B"),
+    FIELD_TYPE.SHORT: ("<h", "<H"),
+    FIELD_TYPE.YEAR: ("<h", "<H"),
+    FIELD_TYPE.INT24: ("<i", "<I"),
+    FIELD_TYPE.LONG: ("<i", "<I"),
+    FIELD_TYPE.LONGLONG: ("<q", "<Q"),
+    FIELD_TYPE.FLOAT: ("<f", "<f"),
+    FIELD_TYPE.DOUBLE: ("<d", "<d"),
+}
+
+
+def _binary_struct_decoder(fmt):
+    unpack_from = struct.Struct(fmt).unpack_from
+    size = struct.calcsize(fmt)
+
+    def decode(data, pos):
+        return unpack_from(data, pos)[0], pos + size
+
+    return decode
+
+
+def _binary_string_decoder(encoding, converter):
+    def decode(data, pos):
+        c = data[pos]
+        if c < 251:
+            end = pos + 1 + c
+            value = data[pos + 1 : end]
+        else:
+            end, value = _read_long_field(data, pos)
+        if encoding is not None:
+            value = value.decode(encoding)
+        if converter is not None:
+            value = converter(value)
+        return value, end
+
+    return decode
+
+
+def _decode_binary_datetime(data, pos, date_only=False):
+    # https://dev.mysql.com/doc/internals/en/binary-protocol-value.html
+    length = data[pos]
+    year = month = day = hour = minute = second = microsecond = 0
+    if length >= 4:
+        year, month, day = struct.unpack_from("<HBB", data, pos + 1)
+    if length >= 7:
+        hour, minute, second = struct.unpack_from("<BBB", data, pos + 5)
+    if length >= 11:
+        microsecond = struct.unpack_from("<I", data, pos + 8)[0]
+    try:
+        if date_only:
+            value = datetime.date(year, month, day)
+        else:
+            value = datetime.datetime(
+                year, month, day, hour, minute, second, microsecond
+            )
+    except ValueError:
+        # Zero or invalid dates, returned as text like the text protocol does.
+        value = "%04d-%02d-%02d" % (year, month, day)
+        if not date_only:
+            value += " %02d:%02d:%02d" % (hour, minute, second)
+    return value, pos + 1 + length
+
+
+def _decode_binary_date(data, pos):
+    return _decode_binary_datetime(data, pos, True)
+
+
+def _decode_binary_time(data, pos):
+    length = data[pos]
+    if length == 0:
+        return datetime.timedelta(0), pos + 1
+    negative, days, hour, minute, second = struct.unpack_from("<BIBBB", data, pos + 1)
+    microsecond = 0
+    if length >= 12:
+        microsecond = struct.unpack_from("<I", data, pos + 9)[0]
+    value = datetime.timedelta(
+        days=days, hours=hour, minutes=minute, seconds=second, microseconds=microsecond
+    )
+    return (-value if negative else value), pos + 1 + length
+
+
+def _make_binary_row_decoder(fields, converters):
+    """Build a function decoding a binary protocol row (COM_STMT_EXECUTE).
+
+    Numbers, dates and times are decoded from their binary representation
+    (the converters of these types are not used); the other columns are
+    length coded strings and get the same encoding and converter as with
+    the text protocol.
+    """
+    columns = []
+    for i, (field, (encoding, converter)) in enumerate(zip(fields, converters)):
+        field_type = field.type_code
+        if field_type in _BINARY_FORMATS:
+            signed, unsigned = _BINARY_FORMATS[field_type]
+            decode = _binary_struct_decoder(
+                unsigned if field.flags & FLAG.UNSIGNED else signed
+            )
+        elif field_type in (FIELD_TYPE.DATETIME, FIELD_TYPE.TIMESTAMP):
+            decode = _decode_binary_datetime
+        elif field_type == FIELD_TYPE.DATE:
+            decode = _decode_binary_date
+        elif field_type == FIELD_TYPE.TIME:
+            decode = _decode_binary_time
+        else:
+            decode = _binary_string_decoder(encoding, converter)
+        # The NULL bitmap of result rows starts at bit 2.
+        columns.append((1 + ((i + 2) >> 3), 1 << ((i + 2) & 7), decode))
+    values_start = 1 + (len(columns) + 7 + 2) // 8
+
+    def decode_row(data):
+        pos = values_start
+        row = []
+        for index, mask, decode in columns:
+            if data[index] & mask:
+                row.append(None)
+            else:
+                value, pos = decode(data, pos)
+                row.append(value)
+        return tuple(row)
+
+    return decode_row
+
+
+def _encode_binary_params(args, encoding):
+    """Encode the COM_STMT_EXECUTE parameter block for 'args'."""
+    null_bitmap = bytearray((len(args) + 7) // 8)
+    types = []
+    values = []
+    for i, arg in enumerate(args):
+        if arg is None:
+            null_bitmap[i >> 3] |= 1 << (i & 7)
+            types.append(struct.pack("<BB", FIELD_TYPE.NULL, 0))
+        elif isinstance(arg, int) and -(1 << 63) <= arg < (1 << 64):
+            if arg >= 1 << 63:
+                types.append(struct.pack("<BB", FIELD_TYPE.LONGLONG, 0x80))
+                values.append(struct.pack("<Q", arg))
+            else:
+                types.append(struct.pack("<BB", FIELD_TYPE.LONGLONG, 0))
+                values.append(struct.pack("<q", arg))
+        elif isinstance(arg, float):
+            types.append(struct.pack("<BB", FIELD_TYPE.DOUBLE, 0))
+            values.append(struct.pack("<d", arg))
+        elif isinstance(arg, datetime.datetime):
+            types.append(struct.pack("<BB", FIELD_TYPE.DATETIME, 0))
+            values.append(
+                struct.pack(
+                    "<BHBBBBBI",
+                    11,
+                    arg.year,
+                    arg.month,
+                    arg.day,
+                    arg.hour,
+                    arg.minute,
+                    arg.second,
+                    arg.microsecond,
+                )
+            )
+        elif isinstance(arg, datetime.date):
+            types.append(struct.pack("<BB", FIELD_TYPE.DATE, 0))
+            values.append(struct.pack("<BHBB", 4, arg.year, arg.month, arg.day))
+        elif isinstance(arg, (datetime.timedelta, datetime.time)):
+            if isinstance(arg, datetime.time):
+                negative, days = 0, 0
+                hours, minutes, seconds = arg.hour, arg.minute, arg.second
+                microseconds = arg.microsecond
+            else:
+                negative = arg < datetime.timedelta(0)
+                arg = abs(arg)
+                days, seconds = arg.days, arg.seconds
+                hours, minutes, seconds = seconds // 3600, seconds // 60 % 60, seconds % 60
+                microseconds = arg.microseconds
+            types.append(struct.pack("<BB", FIELD_TYPE.TIME, 0))
+            values.append(
+                struct.pack(
+                    "<BBIBBBI", 12, negative, days, hours, minutes, seconds, microseconds
+                )
+            )
+        else:
+            if isinstance(arg, (bytes, bytearray)):
+                field_type = FIELD_TYPE.BLOB
+            else:
+                field_type = FIELD_TYPE.VAR_STRING
+                if not isinstance(arg, str):
+                    arg = str(arg)
+                arg = arg.encode(encoding, "surrogateescape")
+            types.append(struct.pack("<BB", field_type, 0))
+            values.append(_lenenc_int(len(arg)) + arg)
+    # new-params-bound-flag is always set, types are sent with every execute
+    return bytes(null_bitmap) + b"\x01" + b"".join(types) + b"".join(values)
+
+
+class PreparedStatement:
+    """A server side prepared statement.
+
+    Created and cached by Connection.prepare(); do not create it yourself.
+    """
+
+    def __init__(self, sql, statement_id, params, fields):
+        self.sql = sql
+        self.statement_id = statement_id
+        #: FieldDescriptorPacket of each parameter (may be empty)
+        self.params = params
+        #: FieldDescriptorPacket of each result column
+        self.fields = fields
+
+    @property
+    def param_count(self):
+        return len(self.params)
+
+
+class _ZlibCompression:
+    algorithm = "zlib"
+
+    def compress(self, data):
+        return zlib.compress(data)
+
+    def decompress(self, data, length):
+        return zlib.decompress(data, zlib.MAX_WBITS, length)
+
+
+class _ZstdCompression:
+    algorithm = "zstd"
+
+    def __init__(self, level):
+        self._compressor = zstandard.ZstdCompressor(level=level)
+        self._decompressor = zstandard.ZstdDecompressor()
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def decompress(self, data, length):
+        return self._decompressor.decompress(data, max_output_size=length)
+
+
 class Connection:
     """
     Representation of a socket with a mysql server.
@@ -148,7 +745,12 @@ class Connection:
         (if no authenticate method) for returning a string from the user. (experimental)
     :param server_public_key: SHA256 authentication plugin public key value. (default: None)
     :param binary_prefix: Add _binary prefix on bytes and bytearray. (default: False)
-    :param compress: Not supported
+    :param compress: Use the compressed protocol: "zlib" (or True) or "zstd".
+        zstd needs the zstandard module.  Falls back to zlib, then to no
+        compression, when the server doesn't support the algorithm. (default: None)
+    :param zstd_level: Compression level of the "zstd" algorithm. (default: 3)
+    :param prepared_statement_cache_size: Number of server side prepared statements
+        kept open per connection by prepare(). (default: 64)
     :param named_pipe: Not supported
     :param db: **DEPRECATED** Alias for database.
     :param passwd: **DEPRECATED** Alias for password.
@@ -158,6 +760,18 @@ class Connection:
     """
 
     _sock = None
+    _sock_timeout = _TIMEOUT_UNSET
+    _deprecate_eof = False
+    _compression = None
+    _next_comp_seq_id = 0
+    _rbuf = None
+    _rbuf_view = None
+    _rbuf_start = 0
+    _rbuf_end = 0
+    _cbuf = None
+    _cbuf_view = None
+    _cbuf_start = 0
+    _cbuf_end = 0
     _auth_plugin_name = ""
     _closed = False
     _secure = False
@@ -199,7 +813,9 @@ class Connection:
         ssl_key=None,
         ssl_verify_cert=None,
         ssl_verify_identity=None,
-        compress=None,  # not supported
+        compress=None,
+        zstd_level=DEFAULT_ZSTD_LEVEL,
+        prepared_statement_cache_size=64,
         named_pipe=None,  # not supported
         passwd=None,  # deprecated
         db=None,  # deprecated
@@ -217,10 +833,21 @@ class Connection:
             # )
             password = passwd
 
-        if compress or named_pipe:
-            raise NotImplementedError(
-                "compress and named_pipe arguments are not supported"
-            )
+        if named_pipe:
+            raise NotImplementedError("named_pipe argument is not supported")
+
+        if compress is True:
+            compress = "zlib"
+        if compress not in (None, False, "zlib", "zstd"):
+            raise ValueError("compress should be one of 'zlib' or 'zstd'")
+        if compress == "zstd" and zstandard is None:
+            raise ImportError("compress='zstd' requires the zstandard module")
+        self.compress = compress or None
+        self.zstd_level = zstd_level
+        if prepared_statement_cache_size < 1:
+            raise ValueError("prepared_statement_cache_size should be >= 1")
+        self.prepared_statement_cache_size = prepared_statement_cache_size
+        self._prepared_statements = OrderedDict()
 
         self._local_infile = bool(local_infile)
         if self._local_infile:
@@ -406,6 +1033,7 @@ class Connection:
         if self._sock is None:
             return
         send_data = struct.pack("<iB", 1, COMMAND.COM_QUIT)
+        self._next_comp_seq_id = 0
         try:
             self._write_bytes(send_data)
         except Exception:
@@ -426,7 +1054,11 @@ class Connection:
             except:  # noqa
                 pass
         self._sock = None
-        self._rfile = None
+        self._compression = None
+        self._rbuf = self._rbuf_view = None
+        self._rbuf_start = self._rbuf_end = 0
+        self._cbuf = self._cbuf_view = None
+        self._cbuf_start = self._cbuf_end = 0
 
     __del__ = _force_close
 
@@ -531,7 +1163,8 @@ class Connection:
         Create a new cursor to execute queries with.
 
         :param cursor: The type of cursor to create; one of :py:class:`Cursor`,
-            :py:class:`SSCursor`, :py:class:`DictCursor`, or :py:class:`SSDictCursor`.
+            :py:class:`SSCursor`, :py:class:`DictCursor`, :py:class:`SSDictCursor`,
+            :py:class:`ColumnarCursor` or :py:class:`PreparedCursor`.
             None means use Cursor.
         """
         if cursor:
@@ -539,17 +1172,85 @@ class Connection:
         return self.cursorclass(self)
 
     # The following methods are INTERNAL USE ONLY (called from Cursor)
-    def query(self, sql, unbuffered=False):
+    def query(self, sql, unbuffered=False, columnar=False, lazy=False):
         # if DEBUG:
         #     print("DEBUG: sending query:", sql)
         if isinstance(sql, str):
             sql = sql.encode(self.encoding, "surrogateescape")
         self._execute_command(COMMAND.COM_QUERY, sql)
-        self._affected_rows = self._read_query_result(unbuffered=unbuffered)
+        self._affected_rows = self._read_query_result(
+            unbuffered=unbuffered, columnar=columnar, lazy=lazy
+        )
         return self._affected_rows
 
-    def next_result(self, unbuffered=False):
-        self._affected_rows = self._read_query_result(unbuffered=unbuffered)
+    def next_result(self, unbuffered=False, columnar=False, lazy=False):
+        # More results of a prepared statement (CALL) use the binary protocol too.
+        binary = self._result is not None and self._result.binary
+        self._affected_rows = self._read_query_result(
+            unbuffered=unbuffered, columnar=columnar, binary=binary, lazy=lazy
+        )
+        return self._affected_rows
+
+    def prepare(self, sql):
+        """Prepare 'sql' on the server (COM_STMT_PREPARE).
+
+        Statements are kept in a per-connection LRU of
+        prepared_statement_cache_size entries, so preparing the same
+        statement again returns the cached one.  Evicted statements are
+        closed on the server.
+
+        :return: PreparedStatement to pass to execute_prepared().
+        """
+        if isinstance(sql, str):
+            sql = sql.encode(self.encoding, "surrogateescape")
+        statements = self._prepared_statements
+        stmt = statements.get(sql)
+        if stmt is not None:
+            statements.move_to_end(sql)
+            return stmt
+
+        self._execute_command(COMMAND.COM_STMT_PREPARE, sql)
+        packet = self._read_packet()
+        # https://dev.mysql.com/doc/internals/en/com-stmt-prepare-response.html
+        packet.advance(1)  # status: 0x00
+        statement_id, column_count, param_count = packet.read_struct("<IHH")
+        params = self._read_field_descriptors(param_count)
+        fields = self._read_field_descriptors(column_count)
+        stmt = PreparedStatement(sql, statement_id, params, fields)
+
+        statements[sql] = stmt
+        while len(statements) > self.prepared_statement_cache_size:
+            _, evicted = statements.popitem(last=False)
+            self._execute_command(
+                COMMAND.COM_STMT_CLOSE, struct.pack("<I", evicted.statement_id)
+            )  # no response
+        return stmt
+
+    def _read_field_descriptors(self, count):
+        fields = [self._read_packet(FieldDescriptorPacket) for _ in range(count)]
+        if count and not self._deprecate_eof:
+            eof_packet = self._read_packet()
+            assert eof_packet.is_eof_packet(), "Protocol error, expecting EOF"
+        return fields
+
+    def execute_prepared(self, stmt, args=(), unbuffered=False):
+        """Execute a statement returned by prepare() (COM_STMT_EXECUTE).
+
+        The result rows are read with the binary protocol.
+        """
+        if len(args) != stmt.param_count:
+            raise err.ProgrammingError(
+                "Statement takes %d parameters, %d given"
+                % (stmt.param_count, len(args))
+            )
+        # flags: CURSOR_TYPE_NO_CURSOR, iteration count: 1
+        payload = struct.pack("<IBI", stmt.statement_id, 0, 1)
+        if args:
+            payload += _encode_binary_params(args, self.encoding)
+        self._execute_command(COMMAND.COM_STMT_EXECUTE, payload)
+        self._affected_rows = self._read_query_result(
+            unbuffered=unbuffered, binary=True
+        )
         return self._affected_rows
 
     def affected_rows(self):
@@ -626,7 +1327,10 @@ class Connection:
                 sock.settimeout(None)
 
             self._sock = sock
-            self._rfile = sock.makefile("rb")
+            self._sock_timeout = _TIMEOUT_UNSET
+            self._compression = None
+            self._prepared_statements = OrderedDict()
+            self._reset_recv_buffer()
             self._next_seq_id = 0
 
             self._get_server_information()
@@ -645,7 +1349,8 @@ class Connection:
             if self.autocommit_mode is not None:
                 self.autocommit(self.autocommit_mode)
         except BaseException as e:
-            self._rfile = None
+            self._rbuf = self._rbuf_view = None
+            self._cbuf = self._cbuf_view = None
             if sock is not None:
                 try:
                     sock.close()
@@ -687,12 +1392,14 @@ class Connection:
         :raise OperationalError: If the connection to the MySQL server is lost.
         :raise InternalError: If the packet sequence number is wrong.
         """
-        buff = bytearray()
+        buff = None
         while True:
-            packet_header = self._read_bytes(4)
-            # if DEBUG: dump_packet(packet_header)
-
-            btrl, btrh, packet_number = struct.unpack("<HBB", packet_header)
+            if self._rbuf_end - self._rbuf_start < 4:
+                self._recv_until(4)
+            btrl, btrh, packet_number = struct.unpack_from(
+                "<HBB", self._rbuf, self._rbuf_start
+            )
+            self._rbuf_start += 4
             bytes_to_read = btrl + (btrh << 16)
             if packet_number != self._next_seq_id:
                 self._force_close()
@@ -711,14 +1418,21 @@ class Connection:
             recv_data = self._read_bytes(bytes_to_read)
             if DEBUG:
                 dump_packet(recv_data)
-            buff += recv_data
             # https://dev.mysql.com/doc/internals/en/sending-more-than-16mbyte.html
             if bytes_to_read == 0xFFFFFF:
+                if buff is None:
+                    buff = []
+                buff.append(recv_data)
                 continue
             if bytes_to_read < MAX_PACKET_LEN:
                 break
 
-        packet = packet_type(bytes(buff), self.encoding)
+        # Common case: the payload fits in one packet and is used as is,
+        # only split payloads are joined (one copy, no bytearray round trip).
+        if buff is not None:
+            buff.append(recv_data)
+            recv_data = b"".join(buff)
+        packet = packet_type(recv_data, self.encoding)
         if packet.is_error_packet():
             if self._result is not None and self._result.unbuffered_active is True:
                 self._result.unbuffered_active = False
@@ -726,10 +1440,88 @@ class Connection:
         return packet
 
     def _read_bytes(self, num_bytes):
-        self._sock.settimeout(self._read_timeout)
+        """Return the next 'num_bytes' bytes from the receive buffer."""
+        if self._rbuf_end - self._rbuf_start < num_bytes:
+            self._recv_until(num_bytes)
+        start = self._rbuf_start
+        self._rbuf_start = start + num_bytes
+        return bytes(self._rbuf_view[start : start + num_bytes])
+
+    def _read_buffered_row(self):
+        """Consume the next packet if it is a row held whole in _rbuf.
+
+        Returns the offset of the payload in _rbuf, which then ends at
+        _rbuf_start; the row has to be decoded before the next read.  Returns
+        -1 without consuming anything for a packet that is not buffered yet,
+        is split, or may be an EOF, OK or error packet: _read_packet() reads
+        these.
+        """
+        start = self._rbuf_start
+        pos = start + 4
+        if pos >= self._rbuf_end:
+            return -1
+        low, high, packet_number = struct.unpack_from("<HBB", self._rbuf, start)
+        end = pos + low + (high << 16)
+        if (
+            end > self._rbuf_end
+            or end == pos
+            or packet_number != self._next_seq_id
+            or self._rbuf[pos] >= 0xFE
+            or end - pos == MAX_PACKET_LEN
+        ):
+            return -1
+        self._next_seq_id = (packet_number + 1) % 256
+        self._rbuf_start = end
+        return pos
+
+    def _reset_recv_buffer(self):
+        self._rbuf = bytearray(RECV_BUFFER_SIZE)
+        self._rbuf_view = memoryview(self._rbuf)
+        self._rbuf_start = self._rbuf_end = 0
+        # Compressed frames are received here, allocated on first use.
+        self._cbuf = self._cbuf_view = None
+        self._cbuf_start = self._cbuf_end = 0
+
+    def _recv_until(self, num_bytes):
+        """Receive from the socket until at least 'num_bytes' are buffered.
+
+        Reads as much as the socket has ready (up to the free buffer space)
+        with one recv_into() call, so following packets are usually served
+        from memory.  With the compressed protocol, whole frames are read and
+        their uncompressed payload is buffered.
+        """
+        self._reserve_recv_buffer(num_bytes)
+        self._set_sock_timeout(self._read_timeout)
+        if self._compression is not None:
+            while self._rbuf_end - self._rbuf_start < num_bytes:
+                self._read_compressed_frame()
+            return
+
+        start, end = self._rbuf_start, self._rbuf_end
+        view = self._rbuf_view
+        while end - start < num_bytes:
+            end += self._sock_recv_into(view[end:])
+        self._rbuf_end = end
+
+    def _reserve_recv_buffer(self, num_bytes):
+        """Make room for 'num_bytes' bytes after the unread buffered data."""
+        start, end = self._rbuf_start, self._rbuf_end
+        if start + num_bytes <= len(self._rbuf) and (
+            start != end or len(self._rbuf) == RECV_BUFFER_SIZE
+        ):
+            return
+        (
+            self._rbuf,
+            self._rbuf_view,
+            self._rbuf_start,
+            self._rbuf_end,
+        ) = _reserve_buffer(self._rbuf, self._rbuf_view, start, end, num_bytes)
+
+    def _sock_recv_into(self, view):
+        """recv_into() 'view', raising OperationalError when the connection is lost."""
         while True:
             try:
-                data = self._rfile.read(num_bytes)
+                received = self._sock.recv_into(view)
                 break
             except (IOError, OSError) as e:
                 if e.errno == errno.EINTR:
@@ -743,15 +1535,103 @@ class Connection:
                 # Don't convert unknown exception to MySQLError.
                 self._force_close()
                 raise
-        if len(data) < num_bytes:
+        if not received:
             self._force_close()
             raise err.OperationalError(
                 CR.CR_SERVER_LOST, "Lost connection to MySQL server during query"
             )
-        return data
+        return received
+
+    def _recv_compressed(self, num_bytes):
+        """Receive from the socket until at least 'num_bytes' bytes of
+        compressed frames are buffered in _cbuf.
+
+        Like _recv_until() for the uncompressed stream: every recv_into()
+        reads as much as the socket has ready, so the small frames of a
+        result set are usually served from memory.
+        """
+        if self._cbuf is None:
+            self._cbuf = bytearray(RECV_BUFFER_SIZE)
+            self._cbuf_view = memoryview(self._cbuf)
+        start, end = self._cbuf_start, self._cbuf_end
+        cbuf, view, start, end = _reserve_buffer(
+            self._cbuf, self._cbuf_view, start, end, num_bytes
+        )
+        self._cbuf, self._cbuf_view = cbuf, view
+        while end - start < num_bytes:
+            end += self._sock_recv_into(view[end:])
+        self._cbuf_start, self._cbuf_end = start, end
+
+    def _read_compressed_frame(self):
+        """Read one compressed protocol frame into the receive buffer.
+
+        The payload is decompressed (or copied, for an uncompressed frame)
+        from _cbuf to the end of _rbuf.
+
+        :raise InternalError: If the frame sequence number is wrong.
+        """
+        # https://dev.mysql.com/doc/dev/mysql-server/latest/page_protocol_basic_compression.html
+        if self._cbuf_end - self._cbuf_start < 7:
+            self._recv_compressed(7)
+        low, high, frame_number, raw_low, raw_high = struct.unpack_from(
+            "<HBBHB", self._cbuf, self._cbuf_start
+        )
+        length = low + (high << 16)
+        raw_length = raw_low + (raw_high << 16)
+        if frame_number != self._next_comp_seq_id:
+            self._force_close()
+            raise err.InternalError(
+                "Compressed packet sequence number wrong - got %d expected %d"
+                % (frame_number, self._next_comp_seq_id)
+            )
+        self._next_comp_seq_id = (frame_number + 1) % 256
+        if self._cbuf_end - self._cbuf_start < 7 + length:
+            self._recv_compressed(7 + length)
+        start = self._cbuf_start + 7
+        self._cbuf_start = start + length
+        payload = self._cbuf_view[start : start + length]
+        if raw_length:
+            payload = self._compression.decompress(payload, raw_length)
+        size = len(payload)
+        self._reserve_recv_buffer(self._rbuf_end - self._rbuf_start + size)
+        end = self._rbuf_end
+        self._rbuf_view[end : end + size] = payload
+        self._rbuf_end = end + size
+
+    def _compress_frames(self, data):
+        """Wrap 'data' (whole mysql packets) into compressed protocol frames."""
+        compression = self._compression
+        frames = []
+        for i in range(0, len(data) or 1, MAX_PACKET_LEN):
+            chunk = data[i : i + MAX_PACKET_LEN]
+            payload, raw_length = chunk, 0
+            if len(chunk) >= MIN_COMPRESS_LENGTH:
+                compressed = compression.compress(chunk)
+                if len(compressed) < len(chunk):
+                    payload, raw_length = compressed, len(chunk)
+            frames.append(
+                _pack_int24(len(payload))
+                + bytes([self._next_comp_seq_id])
+                + _pack_int24(raw_length)
+            )
+            frames.append(payload)
+            self._next_comp_seq_id = (self._next_comp_seq_id + 1) % 256
+        return b"".join(frames)
+
+    def _set_sock_timeout(self, timeout):
+        # settimeout() is a syscall; only issue it when the timeout changes,
+        # i.e. at most once per direction of a command.
+        if timeout != self._sock_timeout:
+            self._sock.settimeout(timeout)
+            self._sock_timeout = timeout
 
     def _write_bytes(self, data):
-        self._sock.settimeout(self._write_timeout)
+        if self._compression is not None:
+            data = self._compress_frames(data)
+        self._send_bytes(data)
+
+    def _send_bytes(self, data):
+        self._set_sock_timeout(self._write_timeout)
         try:
             self._sock.sendall(data)
         except IOError as e:
@@ -760,11 +1640,15 @@ class Connection:
                 CR.CR_SERVER_GONE_ERROR, "MySQL server has gone away (%r)" % (e,)
             )
 
-    def _read_query_result(self, unbuffered=False):
+    def _read_query_result(
+        self, unbuffered=False, columnar=False, binary=False, lazy=False
+    ):
         self._result = None
         if unbuffered:
             try:
                 result = MySQLResult(self)
+                result.binary = binary
+                result.lazy = lazy
                 result.init_unbuffered_query()
             except:
                 result.unbuffered_active = False
@@ -772,6 +1656,9 @@ class Connection:
                 raise
         else:
             result = MySQLResult(self)
+            result.columnar = columnar
+            result.binary = binary
+            result.lazy = lazy
             result.read()
         self._result = result
         if result.server_status is not None:
@@ -792,6 +1679,16 @@ class Connection:
         if not self._sock:
             raise err.InterfaceError(0, "")
 
+        self._finish_result()
+
+        packets, next_seq_id = self._command_packets(command, sql)
+        self._next_comp_seq_id = 0
+        self._write_bytes(packets)
+        if DEBUG:
+            dump_packet(packets)
+        self._next_seq_id = next_seq_id
+
+    def _finish_result(self):
         # If the last query was unbuffered, make sure it finishes before
         # sending new commands
         if self._result is not None:
@@ -802,30 +1699,96 @@ class Connection:
                 self.next_result()
             self._result = None
 
+    def _command_packets(self, command, sql):
+        """Build the packets sending 'command' with argument 'sql'.
+
+        :return: (packets, sequence id of the first response packet)
+        """
         if isinstance(sql, str):
             sql = sql.encode(self.encoding)
 
         packet_size = min(MAX_PACKET_LEN, len(sql) + 1)  # +1 is for command
-
-        # tiny optimization: build first packet manually instead of
-        # calling self..write_packet()
-        prelude = struct.pack("<iB", packet_size, command)
-        packet = prelude + sql[: packet_size - 1]
-        self._write_bytes(packet)
-        if DEBUG:
-            dump_packet(packet)
-        self._next_seq_id = 1
-
+        packet = struct.pack("<iB", packet_size, command) + sql[: packet_size - 1]
+        seq_id = 1
         if packet_size < MAX_PACKET_LEN:
-            return
+            return packet, seq_id
 
+        packets = [packet]
         sql = sql[packet_size - 1 :]
         while True:
             packet_size = min(MAX_PACKET_LEN, len(sql))
-            self.write_packet(sql[:packet_size])
+            packets.append(_pack_int24(packet_size) + bytes([seq_id]) + sql[:packet_size])
+            seq_id = (seq_id + 1) % 256
             sql = sql[packet_size:]
             if not sql and packet_size < MAX_PACKET_LEN:
                 break
+        return b"".join(packets), seq_id
+
+    def query_pipeline(self, queries, raise_on_error=True):
+        """Run several queries with one round trip (pipelining).
+
+        The COM_QUERY packets are written back to back, then the results are
+        read in order.  Queries are sent in batches of about
+        PIPELINE_BATCH_SIZE bytes so that neither side blocks on full socket
+        buffers.  An error of one query doesn't affect the others.  Only the
+        first result set of each query is kept.
+
+        :param queries: Iterable of SQL statements.
+        :param raise_on_error: If true, raise the first error once all the
+            results were read; otherwise the exception takes the place of the
+            failed query's result.
+        :return: List of MySQLResult, one per query.
+        :raise InterfaceError: If the connection is closed.
+        """
+        if not self._sock:
+            raise err.InterfaceError(0, "")
+        self._finish_result()
+
+        results = []
+        batch = []
+        batch_size = 0
+        for sql in queries:
+            if isinstance(sql, str):
+                sql = sql.encode(self.encoding, "surrogateescape")
+            packets, seq_id = self._command_packets(COMMAND.COM_QUERY, sql)
+            comp_seq_id = 0
+            if self._compression is not None:
+                # Every command starts a new compressed sequence.
+                self._next_comp_seq_id = 0
+                packets = self._compress_frames(packets)
+                comp_seq_id = self._next_comp_seq_id
+            batch.append((seq_id, comp_seq_id))
+            batch.append(packets)
+            batch_size += len(packets)
+            if batch_size >= PIPELINE_BATCH_SIZE:
+                self._run_pipeline_batch(batch, results)
+                batch = []
+                batch_size = 0
+        if batch:
+            self._run_pipeline_batch(batch, results)
+
+        if raise_on_error:
+            for result in results:
+                if isinstance(result, Exception):
+                    raise result
+        return results
+
+    def _run_pipeline_batch(self, batch, results):
+        self._send_bytes(b"".join(batch[1::2]))
+        for seq_id, comp_seq_id in batch[::2]:
+            self._next_seq_id = seq_id
+            self._next_comp_seq_id = comp_seq_id
+            try:
+                self._read_query_result()
+                result = self._result
+                self._finish_result()
+            except err.MySQLError as e:
+                if not self._sock:
+                    # The connection is lost, the other results can't be read.
+                    raise
+                # An error packet ends this query's response only.
+                result = e
+            results.append(result)
 
     def _request_authentication(self):
         # https://dev.mysql.com/doc/internals/en/connection-phase-packets.html#packet-Protocol::HandshakeResponse
@@ -839,15 +1802,31 @@ class Connection:
         if isinstance(self.user, str):
             self.user = self.user.encode(self.encoding)
 
-        data_init = struct.pack(
-            "<iIB23s", self.client_flag, MAX_PACKET_LEN, charset_id, b""
-        )
+        # Only ask for DEPRECATE_EOF when the server offers it.
+        client_flag = self.client_flag
+        if not self.server_capabilities & CLIENT.DEPRECATE_EOF:
+            client_flag &= ~CLIENT.DEPRECATE_EOF
+        self._deprecate_eof = bool(client_flag & CLIENT.DEPRECATE_EOF)
+
+        compression = None
+        if (
+            self.compress == "zstd"
+            and self.server_capabilities & CLIENT.ZSTD_COMPRESSION_ALGORITHM
+        ):
+            client_flag |= CLIENT.ZSTD_COMPRESSION_ALGORITHM
+            compression = _ZstdCompression(self.zstd_level)
+        elif self.compress and self.server_capabilities & CLIENT.COMPRESS:
+            client_flag |= CLIENT.COMPRESS
+            compression = _ZlibCompression()
+
+        data_init = struct.pack("<iIB23s", client_flag, MAX_PACKET_LEN, charset_id, b"")
 
         if self.ssl and self.server_capabilities & CLIENT.SSL:
             self.write_packet(data_init)
 
             self._sock = self.ctx.wrap_socket(self._sock, server_hostname=self.host)
-            self._rfile = self._sock.makefile("rb")
+            self._sock_timeout = _TIMEOUT_UNSET
+            self._reset_recv_buffer()
             self._secure = True
 
         data = data_init + self.user + b"\0"
@@ -903,6 +1882,9 @@ class Connection:
                 connect_attrs += struct.pack("B", len(v)) + v
             data += struct.pack("B", len(connect_attrs)) + connect_attrs
 
+        if client_flag & CLIENT.ZSTD_COMPRESSION_ALGORITHM:
+            data += struct.pack("B", self.zstd_level)
+
         self.write_packet(data)
         auth_packet = self._read_packet()
 
@@ -940,6 +1922,13 @@ class Connection:
         if DEBUG:
             print("Succeed to auth")
 
+        # The compressed protocol starts with the first command.
+        if compression is not None:
+            self._compression = compression
+            self._next_comp_seq_id = 0
+            if DEBUG:
+                print("compressed protocol:", compression.algorithm)
+
     def _process_auth(self, plugin_name, auth_packet):
         handler = self._get_auth_plugin_handler(plugin_name)
         if handler:
@@ -1144,6 +2133,10 @@ class MySQLResult:
         self.field_count = 0
         self.description = None
         self.rows = None
+        self.columns = None
+        self.columnar = False
+        self.binary = False
+        self.lazy = False
         self.has_next = None
         self.unbuffered_active = False
 
@@ -1219,12 +2212,16 @@ class MySQLResult:
         self._read_ok_packet(ok_packet)
 
     def _check_packet_is_eof(self, packet):
+        if self.connection._deprecate_eof:
+            # The rows are terminated by an OK packet with the EOF header.
+            if not packet.is_eof_ok_packet():
+                return False
+            wp = OKPacketWrapper(packet)
+            self.warning_count = wp.warning_count
+            self.has_next = wp.has_next
+            return True
         if not packet.is_eof_packet():
             return False
-        # TODO: Support CLIENT.DEPRECATE_EOF
-        # 1) Add DEPRECATE_EOF to CAPABILITIES
-        # 2) Mask CAPABILITIES with server_capabilities
-        # 3) if server_capabilities & CLIENT.DEPRECATE_EOF: use OKPacketWrapper instead of EOFPacketWrapper
         wp = EOFPacketWrapper(packet)
         self.warning_count = wp.warning_count
         self.has_next = wp.has_next
@@ -1233,7 +2230,10 @@ class MySQLResult:
     def _read_result_packet(self, first_packet):
         self.field_count = first_packet.read_length_encoded_integer()
         self._get_descriptions()
-        self._read_rowdata_packet()
+        if self.columnar:
+            self._read_rowdata_packet_columnar()
+        else:
+            self._read_rowdata_packet()
 
     def _read_rowdata_packet_unbuffered(self):
         # Check if in an active query
@@ -1248,7 +2248,7 @@ class MySQLResult:
             self.rows = None
             return
 
-        row = self._read_row_from_packet(packet)
+        row = self._decode_row(packet.get_all_data())
         self.affected_rows = 1
         self.rows = (row,)  # rows should tuple of row for MySQL-python compatibility.
         return row
@@ -1263,19 +2263,105 @@ class MySQLResult:
                 self.unbuffered_active = False
                 self.connection = None  # release reference to kill cyclic reference.
 
+    def _read_buffered_row(self):
+        """Return Connection._read_buffered_row when the rows can be decoded
+        in place in the receive buffer, else None.
+        """
+        if DEBUG or self.binary or self.lazy:
+            return None
+        return self.connection._read_buffered_row
+
     def _read_rowdata_packet(self):
         """Read a rowdata packet for each data row in the result set."""
         rows = []
+        decode_row = self._decode_row
+        conn = self.connection
+        read_buffered_row = self._read_buffered_row()
         while True:
-            packet = self.connection._read_packet()
+            if read_buffered_row is not None:
+                pos = read_buffered_row()
+                if pos >= 0:
+                    rows.append(
+                        decode_row(conn._rbuf, pos, conn._rbuf_start, conn._rbuf_view)
+                    )
+                    continue
+            packet = conn._read_packet()
             if self._check_packet_is_eof(packet):
                 self.connection = None  # release reference to kill cyclic reference.
                 break
-            rows.append(self._read_row_from_packet(packet))
+            rows.append(decode_row(packet.get_all_data()))
 
         self.affected_rows = len(rows)
         self.rows = tuple(rows)
 
+    def _read_rowdata_packet_columnar(self):
+        """Read the rows of the result set into one sequence per column.
+
+        The values are appended to self.columns as they are decoded; no row
+        tuple is built.  Integer and floating point columns converted with
+        int() / float() are decoded straight into array('q') (array('Q') for
+        BIGINT UNSIGNED) / array('d'); such a column is turned into a list only
+        when it holds NULL (or a value out of the array range).  Other columns
+        are lists.  String columns of
+        (VAR)CHAR/ENUM type are interned, their values tend to repeat (schema
+        names, states, ...).
+        """
+        columns = []
+        typed = []
+        for i, field in enumerate(self.fields):
+            typecodes = ARRAY_TYPECODES.get(field.type_code)
+            if typecodes is not None and self.converters[i][1] in _BYTES_CONVERTERS:
+                columns.append(array(typecodes[bool(field.flags & FLAG.UNSIGNED)]))
+                typed.append(i)
+            else:
+                columns.append([])
+        interned = [
+            i
+            for i, field in enumerate(self.fields)
+            if field.type_code in INTERNED_TYPES and self.converters[i][0] is not None
+        ]
+        others = {i: [] for i in typed}
+
+        def other_appender(column, values):
+            # Keep a placeholder, the column becomes a list after reading.
+            def append_other(value):
+                values.append((len(column), value))
+                column.append(0)
+
+            return append_other
+
+        decode_row = _make_row_decoder(self.converters, True, interned, typed)(
+            *[column.append for column in columns],
+            *[other_appender(columns[i], others[i]) for i in typed]
+        )
+        conn = self.connection
+        read_buffered_row = self._read_buffered_row()
+        count = 0
+        while True:
+            if read_buffered_row is not None:
+                pos = read_buffered_row()
+                if pos >= 0:
+                    decode_row(conn._rbuf, pos, conn._rbuf_start, conn._rbuf_view)
+                    count += 1
+                    continue
+            packet = conn._read_packet()
+            if self._check_packet_is_eof(packet):
+                self.connection = None  # release reference to kill cyclic reference.
+                break
+            decode_row(packet.get_all_data())
+            count += 1
+
+        for i, values in others.items():
+            if values:
+                column = columns[i] = columns[i].tolist()
+                for position, value in values:
+                    column[position] = value
+        self.affected_rows = count
+        self.columns = columns
+
+    def _decode_row_debug(self, data):
+        return self._read_row_from_packet(MysqlPacket(data, None))
+
     def _read_row_from_packet(self, packet):
         row = []
         for encoding, converter in self.converters:
@@ -1334,8 +2420,18 @@ class MySQLResult:
                 print(f"DEBUG: field={field}, converter={converter}")
             self.converters.append((encoding, converter))
 
-        eof_packet = self.connection._read_packet()
-        assert eof_packet.is_eof_packet(), "Protocol error, expecting EOF"
+        if self.binary:
+            self._decode_row = _make_binary_row_decoder(self.fields, self.converters)
+        elif DEBUG:
+            self._decode_row = self._decode_row_debug
+        elif self.lazy:
+            self._decode_row = _make_lazy_row_decoder(self.converters)
+        else:
+            self._decode_row = _make_row_decoder(self.converters)
+
+        if not self.connection._deprecate_eof:
+            eof_packet = self.connection._read_packet()
+            assert eof_packet.is_eof_packet(), "Protocol error, expecting EOF"
         self.description = tuple(description)
 
 
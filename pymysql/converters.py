@@ -171,6 +171,22 @@ def convert_datetime(obj):
     if isinstance(obj, (bytes, bytearray)):
         obj = obj.decode("ascii")
 
+    # Fast path for the YYYY-MM-DD HH:MM:SS[.ffffff] layout sent by the server,
+    # the separators are checked here and the digits by fromisoformat().
+    if (
+        19 <= len(obj) <= 26
+        and obj[4] == "-"
+        and obj[7] == "-"
+        and obj[10] == " "
+        and obj[13] == ":"
+        and obj[16] == ":"
+        and (len(obj) == 19 or obj[19] == "." and obj[20:].isdecimal())
+    ):
+        try:
+            return datetime.datetime.fromisoformat(obj)
+        except ValueError:
+            pass
+
     m = DATETIME_RE.match(obj)
     if not m:
         return convert_date(obj)
@@ -206,6 +222,27 @@ def convert_timedelta(obj):
     if isinstance(obj, (bytes, bytearray)):
         obj = obj.decode("ascii")
 
+    # Fast path for the [-]HHH:MM:SS[.ffffff] layout sent by the server.
+    parts = obj.split(":")
+    if len(parts) == 3:
+        hours, minutes, seconds = parts
+        negate = hours[:1] == "-"
+        if negate:
+            hours = hours[1:]
+        fraction = seconds[3:]
+        if (
+            1 <= len(hours) <= 3
+            and len(minutes) == 2
+            and (len(seconds) == 2 or seconds[2:3] == "." and 1 <= len(fraction) <= 6)
+            and (hours + minutes + seconds[:2] + fraction).isdecimal()
+        ):
+            tdelta = datetime.timedelta(
+                0,
+                int(hours) * 3600 + int(minutes) * 60 + int(seconds[:2]),
+                _convert_second_fraction(fraction),
+            )
+            return -tdelta if negate else tdelta
+
     m = TIMEDELTA_RE.match(obj)
     if not m:
         return obj
@@ -292,6 +329,12 @@ def convert_date(obj):
     """
     if isinstance(obj, (bytes, bytearray)):
         obj = obj.decode("ascii")
+    # Fast path for the YYYY-MM-DD layout sent by the server.
+    if len(obj) == 10 and obj[4] == "-" and obj[7] == "-":
+        try:
+            return datetime.date.fromisoformat(obj)
+        except ValueError:
+            pass
     try:
         return datetime.date(*[int(x) for x in obj.split("-", 2)])
     except ValueError:
@@ -1,6 +1,12 @@
 import re
+from array import array
 from . import err
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 #: Regular expression for :meth:`Cursor.executemany`.
 #: executemany only supports simple bulk insert.
@@ -12,6 +18,9 @@ RE_INSERT_VALUES = re.compile(
     re.IGNORECASE | re.DOTALL,
 )
 
+#: Regular expression for the placeholders of :class:`PreparedCursor`.
+RE_PLACEHOLDER = re.compile(r"%([s%])")
+
 
 class Cursor:
     """
@@ -78,7 +87,7 @@ class Cursor:
     def setoutputsizes(self, *args):
         """Does nothing, required by DB API."""
 
-    def _nextset(self, unbuffered=False):
+    def _nextset(self, unbuffered=False, columnar=False, lazy=False):
         """Get the next query set"""
         conn = self._get_db()
         current_result = self._result
@@ -88,7 +97,7 @@ class Cursor:
             return None
         self._result = None
         self._clear_result()
-        conn.next_result(unbuffered=unbuffered)
+        conn.next_result(unbuffered=unbuffered, columnar=columnar, lazy=lazy)
         self._do_get_result()
         return True
 
@@ -373,6 +382,180 @@ class DictCursor(DictCursorMixin, Cursor):
     """A cursor which returns results as a dictionary"""
 
 
+class PreparedCursor(Cursor):
+    """
+    A cursor which executes queries as server side prepared statements.
+
+    Queries use the same ``%s`` placeholders as Cursor, but the arguments
+    are sent with COM_STMT_EXECUTE instead of being escaped into the query,
+    and rows are read with the binary protocol.  Statements are cached per
+    connection (see Connection.prepare()), so executing the same query
+    again only costs the execute.  Only positional arguments are supported.
+    """
+
+    def execute(self, query, args=None):
+        """Execute a query as a prepared statement
+
+        :param str query: Query to execute, with %s placeholders.
+
+        :param args: parameters used with query. (optional)
+        :type args: tuple or list
+
+        :return: Number of affected rows
+        :rtype: int
+        """
+        while self.nextset():
+            pass
+
+        conn = self._get_db()
+        if args is not None:
+            if isinstance(args, dict):
+                raise err.ProgrammingError(
+                    "PreparedCursor only supports positional arguments"
+                )
+            if not isinstance(args, (tuple, list)):
+                args = (args,)
+            query = RE_PLACEHOLDER.sub(
+                lambda m: "?" if m.group(1) == "s" else "%", query
+            )
+
+        self._last_executed = query
+        self._clear_result()
+        conn.execute_prepared(conn.prepare(query), args or ())
+        self._do_get_result()
+        self._executed = query
+        return self.rowcount
+
+    def executemany(self, query, args):
+        """Run the prepared query once for each item of args"""
+        if not args:
+            return
+        self.rowcount = sum(self.execute(query, arg) for arg in args)
+        return self.rowcount
+
+
+# NumPy dtypes of the array.array typecodes used by the columnar reader.
+_NUMPY_DTYPES = {"q": "int64", "Q": "uint64", "d": "float64"}
+
+
+class _ColumnRows:
+    """Read-only row sequence over the columns of a ColumnarCursor.
+
+    Rows are only built (as tuples) when they are fetched.
+    """
+
+    __slots__ = ("_columns", "_length")
+
+    def __init__(self, columns, length):
+        self._columns = columns
+        self._length = length
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(zip(*[column[index] for column in self._columns]))
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("row index out of range")
+        return tuple([column[index] for column in self._columns])
+
+
+class ColumnarCursor(Cursor):
+    """
+    A cursor which decodes the result set into columns instead of rows.
+
+    Use fetchcolumns() to get a dict of column name to values.  Integer
+    columns are decoded straight into array('q') (array('Q') for BIGINT
+    UNSIGNED) and floating point columns into array('d'); with use_numpy
+    set and NumPy installed they are returned as NumPy arrays sharing the
+    array memory.  Columns containing NULL, and all other columns, are
+    lists.  Values of short string columns are interned.
+
+    fetchone(), fetchmany() and fetchall() still work and build row tuples
+    on demand.
+    """
+
+    #: Return NumPy arrays instead of array.array for numeric columns.
+    use_numpy = False
+
+    def _query(self, q):
+        conn = self._get_db()
+        self._last_executed = q
+        self._clear_result()
+        conn.query(q, columnar=True)
+        self._do_get_result()
+        return self.rowcount
+
+    def nextset(self):
+        return self._nextset(columnar=True)
+
+    def _clear_result(self):
+        super()._clear_result()
+        self._columns = None
+
+    def _do_get_result(self):
+        super()._do_get_result()
+        result = self._result
+        if result.columns is None:
+            return
+        columns = [self._conv_column(column) for column in result.columns]
+        self._columns = columns
+        self._rows = _ColumnRows(columns, result.affected_rows)
+
+    def _conv_column(self, values):
+        if self.use_numpy and numpy is not None and isinstance(values, array):
+            return numpy.frombuffer(values, dtype=_NUMPY_DTYPES[values.typecode])
+        return values
+
+    def fetchcolumns(self):
+        """Fetch all the columns as a dict of column name to values"""
+        self._check_executed()
+        if self._columns is None:
+            return {}
+        fields = []
+        for f in self._result.fields:
+            name = f.name
+            if name in fields:
+                name = f.table_name + "." + name
+            fields.append(name)
+        self.rownumber = len(self._rows)
+        return dict(zip(fields, self._columns))
+
+    def fetchall(self):
+        """Fetch all the rows"""
+        self._check_executed()
+        if self._rows is None:
+            return ()
+        result = self._rows[self.rownumber :]
+        self.rownumber = len(self._rows)
+        return result
+
+
+class LazyCursor(Cursor):
+    """
+    A cursor which returns rows decoding their values on first access.
+
+    Rows are LazyRow sequences: they keep the raw row data, and a column is
+    only decoded and converted when it is read.  Useful when most rows are
+    filtered out on a few columns, or only some of the columns are used.
+    Rows compare equal to tuples of their values.
+    """
+
+    def _query(self, q):
+        conn = self._get_db()
+        self._last_executed = q
+        self._clear_result()
+        conn.query(q, lazy=True)
+        self._do_get_result()
+        return self.rowcount
+
+    def nextset(self):
+        return self._nextset(lazy=True)
+
+
 class SSCursor(Cursor):
     """
     Unbuffered Cursor, mainly useful for queries that return a lot of data,
@@ -190,6 +190,13 @@ class MysqlPacket:
         # If \xFE is LengthEncodedInteger header, 8bytes followed.
         return self._data[0] == 0xFE and len(self._data) < 9
 
+    def is_eof_ok_packet(self):
+        # With CLIENT_DEPRECATE_EOF a result set ends with an OK packet using
+        # the EOF header.  A row only starts with \xFE when its first value
+        # is a LengthEncodedInteger of 8 bytes, i.e. the packet is 16MB+.
+        # https://dev.mysql.com/doc/internals/en/packet-OK_Packet.html
+        return self._data[0] == 0xFE and len(self._data) < 0xFFFFFF
+
     def is_auth_switch_request(self):
         # http://dev.mysql.com/doc/internals/en/connection-phase-packets.html#packet-Protocol::AuthSwitchRequest
         return self._data[0] == 0xFE
@@ -293,7 +300,7 @@ class OKPacketWrapper:
     """
 
     def __init__(self, from_packet):
-        if not from_packet.is_ok_packet():
+        if not (from_packet.is_ok_packet() or from_packet.is_eof_ok_packet()):
             raise ValueError(
                 "Cannot create "
                 + str(self.__class__.__name__)
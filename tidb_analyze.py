@@ -1,12 +1,23 @@
 #!/usr/bin/env python3
 
+import abc
 import datetime
 import getpass
+import os
 import time
 import sys
 import logging as log
 import argparse
 import re
+import bisect
+import socket
+import uuid
+import queue
+import threading
+import json
+import glob
+import mmap
+from collections import OrderedDict, namedtuple
 import pymysql
 import dbutils
 from dbutils.pooled_db import PooledDB
@@ -23,6 +34,43 @@ partition_tables_executed = False
 tables_rows_cache = {}
 table_rows_executed = False
 
+# 缓存慢日志中出现过的表
+slow_log_tables_cache = None
+
+# 缓存热点表及其权重(使用pseudo或过期统计信息的慢查询耗时、慢日志热度、读流量)
+hot_table_scores_cache = None
+
+# 缓存按表(分区)汇总的TiKV读热点流量
+read_hot_objects_cache = None
+
+# 是否按TiKV读热点(tidb_hot_regions)优先搜集读流量大的表(分区)
+read_hot_first = False
+
+# 搜集哪些列的统计信息：all(除大字段外的所有列)、predicate(analyze ... predicate columns)、used(查询中使用过的列和索引列)
+analyze_columns_mode = "all"
+
+# 缓存每个表在查询条件中使用过的列和索引列
+predicate_columns_cache = None
+
+# 按SQL digest缓存从SQL文本中解析出的表，跨轮次(守护进程模式)和跨运行(磁盘存储)复用
+slow_log_digest_cache = None
+
+# 慢日志水位线和按指数衰减累计的表热度(SlowLogState)，跨轮次(守护进程模式)和跨运行(磁盘存储)复用
+slow_log_state = None
+
+# 热点表的来源：slow_query(解析慢日志SQL文本)或statements_summary(服务端按TABLE_NAMES聚合)
+hot_tables_source = "slow_query"
+
+# 设置后从cluster_slow_query按实例和时间片并行读取整个集群的慢日志(ClusterSlowLogCollector)或解析本地慢日志文件
+# (SlowLogFileReader)，否则只读取当前连接的tidb节点的slow_query
+slow_log_collector = None
+
+# 缓存表id(包括分区id)到(table_schema, table_name, partition_name)的映射
+table_id_catalog_cache = None
+
+# 缓存由catalog构建的表名解析索引
+table_name_index_cache = None
+
 
 # todo 考虑当超时或者遇到ctrl+c后终止正在执行的统计信息搜集任务
 
@@ -175,15 +223,15 @@ def get_analyze_drop_stats_objects(conn: pymysql.connect):
     sql_text = """
     show stats_meta;
     """
-    cursor = conn.cursor()
+    # 只用到前两列，LazyCursor不解析其余的列(如Update_time)
+    cursor = conn.cursor(pymysql.cursors.LazyCursor)
     result = []
     # 将stats_meta中的表存入字典
     stats_meta_dict = {}
     try:
         cursor.execute(sql_text)
         for row in cursor:
-            table_schema, table_name, partition_name, update_time, modify_count, row_count = row
-            stats_meta_dict[(table_schema, table_name)] = True
+            stats_meta_dict[(row[0], row[1])] = True
     except Exception as e:
         log.error(f"execute sql:{sql_text},error:{e}")
         return None, False, e
@@ -555,24 +603,17 @@ def gen_need_analyze_sqls(conn: pymysql.connect, slow_query_table_first=False, o
     # 生成统计信息搜集语句
     result = []
     last_table_name = None  # 记录上一个表名，后续分区不执行统计信息搜集
-    first = True
     for table_schema, table_name, partition_name, col_list in need_analyze_objects:
         if partition_name == '':
             last_table_name = (table_schema, table_name)
-            sql_text = f"analyze table `{table_schema}`.`{table_name}`"
         else:
             # 如果当前分区的表已经做过统计信息搜集，那么不需要重复做统计信息搜集
             if (table_schema, table_name) == last_table_name:
                 continue
             # todo 如果表是分区表，那么只做其分区的统计信息搜集，会自动做global merge
             #  stats，但分区是串行执行，存在效率问题？如果表中所有分区都需要做统计信息搜集，那么是否可以直接做表的统计信息搜集？做成 analyze table xxx partition p0,p1,p2形式
-            sql_text = f"analyze table `{table_schema}`.`{table_name}` partition `{partition_name}`"
-        if col_list:
-            # 给每一个列加上反引号
-            col_list = col_list.split(',')
-            col_list = [f"`{col}`" for col in col_list]
-            col_list = ','.join(col_list)
-            sql_text = sql_text + f" columns {col_list}"
+        col_list, predicate = get_analyze_columns(conn, table_schema, table_name, col_list)
+        col_list, sql_text = gen_analyze_sql(table_schema, table_name, partition_name, col_list, predicate)
         result.append((table_schema, table_name, partition_name, col_list, sql_text))
     if order:
         # 按照表记录数大小排序，先做记录数小的表的统计信息搜集
@@ -585,84 +626,1188 @@ def gen_need_analyze_sqls(conn: pymysql.connect, slow_query_table_first=False, o
             else:
                 table_rows = tables_rows_dict[(table_schema, table_name)]
             result[i] = (table_schema, table_name, partition_name, table_rows, col_list, sql_text)
-        # todo 添加slow_query相关的统计信息搜集优先级
-        if succ:
-            result.sort(key=lambda x: x[3])
+    else:
+        result = [(table_schema, table_name, partition_name, 0, col_list, sql_text)
+                  for table_schema, table_name, partition_name, col_list, sql_text in result]
     # 优先给慢日志表中的表做统计信息搜集
-    if slow_query_table_first:
-        table_in_slow_log = get_tablename_from_slow_log(conn)
-        # 在table_in_slow_log中的表优放在result的最前面
-        for table_name in table_in_slow_log:
-            for i in range(len(result)):
-                if table_name == result[i][1]:
-                    result.insert(0, result.pop(i))
-                    break
+    hot_tables = get_hot_tables(conn, slow_query_table_first)
+    # sort为稳定排序，order=False且无慢日志表时保持原有顺序
+    result.sort(key=lambda x: get_analyze_priority(x, hot_tables, order))
     return result, True, None
 
+
+# 生成单个对象的统计信息搜集语句
+def gen_analyze_sql(table_schema: str, table_name: str, partition_name: str, col_list, predicate=False):
+    """
+    This function generates the analyze statement for a single table or partition.
+
+    Parameters:
+    table_schema (str): The schema of the table.
+    table_name (str): The name of the table.
+    partition_name (str): The partition name, '' for the whole table.
+    col_list (str/bool): The comma separated columns to analyze, or False to analyze all columns.
+    predicate (bool, optional): Analyze the predicate columns only (analyze ... predicate columns), col_list is
+        ignored. Defaults to False.
+
+    Returns:
+    tuple: A tuple containing the quoted column list (or False) and the analyze statement.
+    """
+    if partition_name == '':
+        sql_text = f"analyze table `{table_schema}`.`{table_name}`"
+    else:
+        sql_text = f"analyze table `{table_schema}`.`{table_name}` partition `{partition_name}`"
+    if predicate:
+        return False, sql_text + " predicate columns"
+    if col_list:
+        # 给每一个列加上反引号
+        col_list = col_list.split(',')
+        col_list = [f"`{col}`" for col in col_list]
+        col_list = ','.join(col_list)
+        sql_text = sql_text + f" columns {col_list}"
+    return col_list, sql_text
+
+
+# 按analyze_columns_mode确定要搜集的列
+def get_analyze_columns(conn: pymysql.connect, table_schema: str, table_name: str, col_list):
+    """
+    This function decides which columns of a table are analyzed according to analyze_columns_mode.
+
+    In "all" mode col_list is returned unchanged. In "used" mode the columns used in query predicates plus the index
+    columns (see get_predicate_columns) are returned as an explicit column list. In "predicate" mode TiDB's
+    "predicate columns" syntax is used, except for tables with large columns (col_list is set), which get the
+    explicit list so that the large columns stay excluded. Tables without any recorded predicate column, or whose
+    used columns are all large columns, keep col_list.
+
+    Parameters:
+    conn (pymysql.connect): The database connection object.
+    table_schema (str): The schema of the table.
+    table_name (str): The name of the table.
+    col_list (str/bool): The comma separated columns without large columns, or False when the table has none.
+
+    Returns:
+    tuple: (col_list, predicate), the column list to pass to gen_analyze_sql and whether to use predicate columns.
+    """
+    if analyze_columns_mode == "all":
+        return col_list, False
+    predicate_columns, succ, msg = get_predicate_columns(conn)
+    if not succ:
+        return col_list, False
+    columns = predicate_columns.get((table_schema.lower(), table_name.lower()))
+    if not columns:
+        return col_list, False
+    if col_list:
+        allowed = set(col.lower() for col in col_list.split(','))
+        columns = [col for col in columns if col.lower() in allowed]
+        if not columns:
+            return col_list, False
+    elif analyze_columns_mode == "predicate":
+        return False, True
+    return ','.join(columns), False
+
+
+# 获取每个表在查询条件中使用过的列和索引列
+def get_predicate_columns(conn: pymysql.connect):
+    """
+    This function loads in bulk the columns that queries filter on (show column_stats_usage, which reads
+    mysql.column_stats_usage; requires tidb_enable_column_tracking) and the index columns of every table.
+    Only tables with at least one used column are returned. The result is cached and reused until
+    reset_catalog_cache is called; when column_stats_usage can not be read, an empty result is cached.
+
+    Parameters:
+    conn (pymysql.connect): The database connection object.
+
+    Returns:
+    tuple: A tuple containing the following elements:
+        - dict: (table_schema, table_name) in lower case -> list of the used columns followed by the index columns.
+        - bool: A boolean value indicating whether the operation was successful.
+        - None/Exception: If an error occurred during the operation, it returns the exception; otherwise, it returns None.
+    """
+    global predicate_columns_cache
+    if predicate_columns_cache is not None:
+        return predicate_columns_cache, True, None
+    result = {}
+    seen = set()
+
+    def add(table_schema, table_name, column_name):
+        key = (table_schema.lower(), table_name.lower())
+        if (key, column_name.lower()) in seen:
+            return
+        seen.add((key, column_name.lower()))
+        result.setdefault(key, []).append(column_name)
+
+    cursor = conn.cursor(pymysql.cursors.LazyCursor)
+    try:
+        cursor.execute("show column_stats_usage where last_used_at is not null")
+        for row in cursor:
+            # Db_name, Table_name, Partition_name, Column_name, Last_used_at, Last_analyzed_at
+            add(row[0], row[1], row[3])
+        cursor.execute("""
+        select table_schema,table_name,column_name from information_schema.statistics
+        where column_name is not null order by table_schema,table_name,index_name,seq_in_index
+        """)
+        for table_schema, table_name, column_name in cursor:
+            # 只给有使用记录的表补充索引列
+            if (table_schema.lower(), table_name.lower()) in result:
+                add(table_schema, table_name, column_name)
+    except Exception as e:
+        log.warning(f"读取column_stats_usage失败，搜集所有列的统计信息: {e}")
+        predicate_columns_cache = {}
+        return None, False, e
+    finally:
+        cursor.close()
+    predicate_columns_cache = result
+    log.info(f"查询条件中使用过列的表数为: {len(result)}")
+    return predicate_columns_cache, True, None
+
+
+# 计算待搜集对象的优先级，值越小越优先
+def get_analyze_priority(analyze_object, hot_tables=None, order=True):
+    """
+    This function computes the sort key of an object that needs to be analyzed.
+    Tables with a higher pseudo stats weight come first (the latency of slow queries planned with pseudo or
+    outdated stats on the table), then the other tables that appear in the slow query log by hotness, then the
+    objects with more TiKV read traffic, then smaller tables when order is True.
+
+    Parameters:
+    analyze_object (tuple): (table_schema, table_name, partition_name, table_rows, col_list, sql_text).
+    hot_tables (dict, optional): The scores returned by get_hot_tables, (table_schema, table_name) ->
+        (pseudo_stats_weight, hotness, read_heat) and (table_schema, table_name, partition_name) -> scores of
+        partitions. A set of (table_schema, table_name) that appear in the slow query log is accepted as well.
+    order (bool, optional): Whether to order by the number of rows in the table. Defaults to True.
+
+    Returns:
+    tuple: The sort key, smaller values are analyzed first.
+    """
+    table_schema, table_name, partition_name, table_rows, col_list, sql_text = analyze_object
+    key = (table_schema, table_name)
+    if isinstance(hot_tables, dict):
+        weight, hotness, heat = hot_tables.get(key, (0, 0, 0))
+        if partition_name:
+            heat = hot_tables.get(key + (partition_name,), (0, 0, 0))[2]
+        hot = 0 if weight > 0 or hotness > 0 else 1
+    else:
+        weight, hotness, heat = 0, 0, 0
+        hot = 0 if hot_tables and key in hot_tables else 1
+    return -weight, hot, -hotness, -heat, (table_rows or 0) if order else 0
+
+
+# 获取热点表及其权重，结果缓存，守护进程模式下随catalog一起刷新
+def get_hot_tables(conn: pymysql.connect, slow_log=True):
+    """
+    This function returns the hot tables used to prioritize the analyze objects. With slow_log, every table that
+    appears in the slow query log (see get_slow_log_hot_tables) gets two scores, the total latency in seconds of the
+    slow queries that were planned with pseudo or outdated stats on it (see get_pseudo_stats_weights), and its
+    long-term hotness. When read_hot_first is set, the tables and partitions with TiKV read hot regions get their
+    read heat (see get_read_hot_objects), a partitioned table gets the sum of its partitions.
+
+    Parameters:
+    conn (pymysql.connect): The database connection object.
+    slow_log (bool, optional): Whether to include the slow query log scores. Defaults to True.
+
+    Returns:
+    dict: (table_schema, table_name) -> (pseudo_stats_weight, hotness, read_heat), and
+        (table_schema, table_name, partition_name) -> (0, 0, read_heat) for partitions.
+    """
+    global hot_table_scores_cache
+    if not slow_log and not read_hot_first:
+        return {}
+    if hot_table_scores_cache is not None:
+        return hot_table_scores_cache
+    result = {}
+    if slow_log:
+        result = {table: (0.0, hotness, 0.0) for table, hotness in get_slow_log_hot_tables(conn).items()}
+        weights, succ, msg = get_pseudo_stats_weights(conn)
+        if not succ:
+            log.warning(f"获取使用pseudo或过期统计信息的表失败: {msg}")
+        else:
+            for table, weight in weights.items():
+                result[table] = (weight, result.get(table, (0.0, 0.0, 0.0))[1], 0.0)
+            if weights:
+                top = sorted(weights.items(), key=lambda x: x[1], reverse=True)[:10]
+                log.info(f"慢查询中使用pseudo或过期统计信息的表数为: {len(weights)}，耗时最多的表: "
+                         f"{', '.join(f'{s}.{t}({round(w, 2)}s)' for (s, t), w in top)}")
+    if read_hot_first:
+        heats, succ, msg = get_read_hot_objects(conn)
+        if not succ:
+            log.warning(f"获取TiKV读热点失败: {msg}")
+        else:
+            for (table_schema, table_name, partition_name), heat in heats.items():
+                if partition_name:
+                    result[(table_schema, table_name, partition_name)] = (0.0, 0.0, heat)
+                weight, hotness, table_heat = result.get((table_schema, table_name), (0.0, 0.0, 0.0))
+                result[(table_schema, table_name)] = (weight, hotness, table_heat + heat)
+    hot_table_scores_cache = result
+    return hot_table_scores_cache
+
+
+# 按表(分区)汇总TiKV读热点流量，结果缓存，守护进程模式下随catalog一起刷新
+def get_read_hot_objects(conn: pymysql.connect, lookback_hours=24):
+    """
+    This function measures the read traffic of every table and partition from the TiKV hot regions, so that
+    objects serving many fast reads are analyzed first even though they never show up in the slow query log.
+
+    The read flow of the hot regions is aggregated per table id (partition ids for partitioned tables) in bulk on
+    the server, from information_schema.tidb_hot_regions_history (average per snapshot in the lookback window) and
+    information_schema.tidb_hot_regions (the current snapshot), the larger of both is used. The flow is then scaled
+    by the share of the table's regions that are hot, using the region_count of
+    information_schema.table_storage_stats, so that a table that is read everywhere outranks a large table with a
+    single hot spot.
+
+    Parameters:
+    conn (pymysql.connect): The database connection object.
+    lookback_hours (int, optional): The lookback window of the hot region history. Defaults to 24.
+
+    Returns:
+    tuple: A tuple containing the following elements:
+        - dict: (table_schema, table_name, partition_name) -> read heat in MB/s, partition_name is '' for tables.
+        - bool: A boolean value indicating whether the operation was successful.
+        - None/Exception: If an error occurred during the operation, it returns the exception; otherwise, it returns None.
+    """
+    global read_hot_objects_cache
+    if read_hot_objects_cache is not None:
+        return read_hot_objects_cache, True, None
+    catalog, succ, msg = get_table_id_catalog(conn)
+    if not succ:
+        return None, False, msg
+    flows = {}  # table_id -> bytes/s
+    hot_regions = {}  # table_id -> 热点region数
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+        select table_id,sum(flow_bytes)/count(distinct update_time),count(distinct region_id)
+        from information_schema.tidb_hot_regions_history
+        where update_time > DATE_SUB(NOW(),INTERVAL {int(lookback_hours)} HOUR) and update_time <= NOW()
+          and type = 'read' and is_leader = 1
+        group by table_id
+        """)
+        for table_id, flow_bytes, region_count in cursor:
+            flows[table_id] = float(flow_bytes or 0)
+            hot_regions[table_id] = int(region_count or 0)
+        cursor.execute("""
+        select table_id,sum(flow_bytes),count(distinct region_id) from information_schema.tidb_hot_regions
+        where type = 'read' group by table_id
+        """)
+        for table_id, flow_bytes, region_count in cursor:
+            flows[table_id] = max(flows.get(table_id, 0.0), float(flow_bytes or 0))
+            hot_regions[table_id] = max(hot_regions.get(table_id, 0), int(region_count or 0))
+        # 只查询有读热点的表所在的模式，table_storage_stats需要按region信息逐表统计
+        schemas = sorted(set(catalog[table_id][0] for table_id in flows if table_id in catalog))
+        region_counts = {}  # (table_schema, table_name) -> region数
+        if schemas:
+            cursor.execute(f"select table_id,region_count from information_schema.table_storage_stats "
+                           f"where table_schema in ({','.join(['%s'] * len(schemas))})", schemas)
+            for table_id, region_count in cursor:
+                if table_id in catalog:
+                    table_schema, table_name, partition_name = catalog[table_id]
+                    key = (table_schema, table_name)
+                    region_counts[key] = region_counts.get(key, 0) + int(region_count or 0)
+    except Exception as e:
+        return None, False, e
+    finally:
+        cursor.close()
+    # 热点region占整个表region的比例，分区使用整个表的比例
+    table_hot_regions = {}
+    for table_id, count in hot_regions.items():
+        if table_id in catalog:
+            key = catalog[table_id][:2]
+            table_hot_regions[key] = table_hot_regions.get(key, 0) + count
+    result = {}
+    for table_id, flow_bytes in flows.items():
+        if table_id not in catalog or flow_bytes <= 0:
+            continue
+        table_schema, table_name, partition_name = catalog[table_id]
+        key = (table_schema, table_name)
+        share = 1.0
+        if region_counts.get(key):
+            share = min(table_hot_regions.get(key, 0) / region_counts[key], 1.0)
+        heat = flow_bytes / 1024 / 1024 * share
+        result_key = (table_schema, table_name, partition_name)
+        result[result_key] = result.get(result_key, 0.0) + heat
+    read_hot_objects_cache = result
+    if result:
+        top = sorted(result.items(), key=lambda x: x[1], reverse=True)[:10]
+        top = [(f"{s}.{t}({p})" if p else f"{s}.{t}", h) for (s, t, p), h in top]
+        log.info(f"TiKV读热点表(分区)数为: {len(result)}，读流量最大的对象: "
+                 f"{', '.join(f'{name}={round(h, 2)}MB/s' for name, h in top)}")
+    return read_hot_objects_cache, True, None
+
+
+# 获取慢日志中出现过的表，结果缓存，守护进程模式下随catalog一起刷新
+def get_slow_log_hot_tables(conn: pymysql.connect):
+    """
+    This function returns the tables that appear in the slow query log with their hotness, or in the statements
+    summary when hot_tables_source is "statements_summary".
+
+    For the slow log the scan is incremental: only the entries after the watermarks of slow_log_state are read, their
+    latency is added to the decayed scores of the state (see SlowLogState), and the watermarks are advanced. For the
+    statements summary the hotness is its sum_latency in seconds. The result is cached and reused until
+    reset_catalog_cache is called.
+
+    Parameters:
+    conn (pymysql.connect): The database connection object.
+
+    Returns:
+    dict: (table_schema, table_name) -> hotness (slow query latency in seconds).
+    """
+    global slow_log_tables_cache, slow_log_state
+    if slow_log_tables_cache is not None:
+        return slow_log_tables_cache
+    if hot_tables_source == "statements_summary":
+        result, succ, msg = get_tablename_from_statements_summary(conn)
+        if succ:
+            result = {(table_schema, table_name): sum_latency / 1e9
+                      for table_schema, table_name, exec_count, sum_latency in result}
+    else:
+        if slow_log_state is None:
+            slow_log_state = SlowLogState()
+        result, succ, msg = get_slow_log_table_latency(conn, slow_log_state.watermarks())
+        if succ:
+            latency, watermarks = result
+            scores = slow_log_state.update(latency, watermarks)
+            # 累计的热度中可能有已经删除的表
+            index, succ, msg = get_table_name_index(conn)
+            if succ:
+                result = {}
+                for (table_schema, table_name), score in scores.items():
+                    table = index.resolve(table_schema, table_name)
+                    if table is not None:
+                        result[table] = result.get(table, 0.0) + score
+    if not succ:
+        log.warning(f"获取慢日志中的表失败: {msg}")
+        return {}
+    slow_log_tables_cache = result
+    return slow_log_tables_cache
+
+
+# 按SQL digest缓存解析出的表，内存LRU + 本地sqlite文件
+class DigestTableCache:
+    """
+    Memo of the table references extracted from a statement, keyed by its digest.
+
+    The references are stored as returned by get_all_tablename without a default database, unqualified names keep
+    schema None so that the same digest run from different databases shares one entry. Entries live in a bounded
+    in-memory LRU; when path is given they are also kept in a SQLite file so that later runs only parse new digests.
+    Disk writes are buffered until flush(), entries not seen for max_age days are removed from the file.
+    """
+
+    def __init__(self, path=None, capacity=20000, max_age=30, table="digest_tables"):
+        self.path = path
+        self.capacity = capacity
+        self.max_age = max_age
+        self.table = table
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._pending = {}
+        self._touched = set()
+        self._lock = threading.Lock()
+        self._disk = None
+        if path:
+            try:
+                self._disk = self._open()
+            except Exception as e:
+                log.warning(f"打开digest缓存文件{path}失败，只使用内存缓存: {e}")
+                self._disk = None
+
+    def _open(self):
+        import sqlite3
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        disk = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        disk.execute(f"create table if not exists {self.table} (digest text primary key, tables text not null, "
+                     f"last_seen integer not null)")
+        disk.commit()
+        return disk
+
+    def _remember(self, digest, tables):
+        self._cache[digest] = tables
+        self._cache.move_to_end(digest)
+        while len(self._cache) > self.capacity:
+            self._cache.popitem(last=False)
+
+    def get(self, digest):
+        """
+        返回digest对应的[(schema or None, table_name)]，未缓存时返回None
+        """
+        with self._lock:
+            tables = self._cache.get(digest)
+            if tables is not None:
+                self._cache.move_to_end(digest)
+                self._touched.add(digest)
+                self.hits += 1
+                return tables
+            if self._disk is not None:
+                row = self._disk.execute(f"select tables from {self.table} where digest = ?", (digest,)).fetchone()
+                if row is not None:
+                    tables = [tuple(item) for item in json.loads(row[0])]
+                    self._remember(digest, tables)
+                    self._touched.add(digest)
+                    self.hits += 1
+                    return tables
+            self.misses += 1
+            return None
+
+    def put(self, digest, tables):
+        with self._lock:
+            tables = list(tables)
+            self._remember(digest, tables)
+            if self._disk is not None:
+                self._pending[digest] = tables
+
+    def flush(self):
+        """
+        将新解析的digest写入磁盘，刷新命中digest的最近使用时间并清理过期记录
+        """
+        with self._lock:
+            if self._disk is None:
+                return
+            now = int(time.time())
+            try:
+                self._disk.executemany(f"insert or replace into {self.table} (digest, tables, last_seen) values (?, ?, ?)",
+                                       [(digest, json.dumps(tables), now) for digest, tables in self._pending.items()])
+                self._disk.executemany(f"update {self.table} set last_seen = ? where digest = ?",
+                                       [(now, digest) for digest in self._touched if digest not in self._pending])
+                self._disk.execute(f"delete from {self.table} where last_seen < ?", (now - self.max_age * 86400,))
+                self._disk.commit()
+            except Exception as e:
+                log.warning(f"写入digest缓存文件{self.path}失败: {e}")
+                self._disk.rollback()
+            self._pending.clear()
+            self._touched.clear()
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            if self._disk is not None:
+                self._disk.close()
+                self._disk = None
+
+
 # 从慢日志表中获取SQL语句中的表名
-def get_tablename_from_slow_log(conn: pymysql.connect):
+def get_tablename_from_slow_log(conn: pymysql.connect, digest_cache: DigestTableCache = None):
     """
     This function retrieves table names from the slow query log in the database.
 
-    The function executes a SQL query to fetch user, database, query time, and the query itself from the slow query log.
-    It limits the results to 10000 and only fetches unique queries (based on their digest) that were executed by external users
-    and have been logged in the last day.
+    It collects the slow log of the last day with get_slow_log_table_latency and returns the tables that were
+    referenced, see get_slow_log_table_latency for how the references are extracted and resolved.
+
+    Parameters:
+    conn (pymysql.connect): The database connection object.
+    digest_cache (DigestTableCache): The memo of extracted table references, defaults to the module level cache
+        slow_log_digest_cache (an in-memory cache is created when it is not set).
+
+    Returns:
+    tuple: A tuple containing the following elements:
+        - list: A list of tuples. Each tuple contains the schema and name of a table that was referenced in a slow query.
+        - bool: A boolean value indicating whether the operation was successful.
+        - None/Exception: If an error occurred during the operation, it returns the exception; otherwise, it returns None.
+    """
+    result, succ, msg = get_slow_log_table_latency(conn, digest_cache=digest_cache)
+    if not succ:
+        return None, False, msg
+    latency, watermarks = result
+    return list(latency), True, None
+
+
+# 汇总慢日志中每个表的慢查询耗时
+def get_slow_log_table_latency(conn: pymysql.connect, watermarks=None, digest_cache: DigestTableCache = None):
+    """
+    This function sums the latency of the slow queries per referenced table.
 
-    After fetching the data, it iterates over the rows and for each row, it extracts all table names from the query using
-    the `get_all_tablename` function. The table names are then added to the result list.
+    The slow log is aggregated per (db, digest): the number of executions, the total query time, one query text and the
+    last Time. By default it is read from slow_query of the TiDB node of conn (at most 100000 entries of external
+    users in the last day), or from slow_log_collector when it is set. With watermarks only the entries logged after
+    the watermark of their source (the TiDB instance or slow log file pattern) are read, so a later run only scans new
+    entries. slow_query only holds the slow log of the connected node, so its watermark is kept per node
+    (@@hostname:@@port); behind a load balancer each node is scanned from its own watermark.
 
-    Finally, it filters the result list to only include tables that actually exist in the database. This is done by fetching
-    all table names from the database using the `get_all_tables_from_database` function and checking if each table in the
-    result list exists in the database.
+    For each digest all (schema, table) references are extracted from the query using the `get_all_tablename`
+    function, unqualified names take the `db` column as schema. The extracted references are memoized by digest in
+    digest_cache, so only digests not seen before are parsed. Finally, the references are resolved with the
+    TableNameIndex of the catalog (see get_table_name_index), which keeps only the tables that actually exist in the
+    database. References without any schema are kept only when the table name exists in a single schema.
 
     Parameters:
     conn (pymysql.connect): The database connection object.
+    watermarks (dict, optional): source -> last processed Time, as returned by a previous call.
+    digest_cache (DigestTableCache): The memo of extracted table references, defaults to the module level cache
+        slow_log_digest_cache (an in-memory cache is created when it is not set).
 
     Returns:
     tuple: A tuple containing the following elements:
-        - list: A list of tuples. Each tuple contains the schema and name of a table that was referenced in a slow query.
+        - tuple: (latency, watermarks). latency is a dict (table_schema, table_name) -> total query time in seconds of
+          the slow queries that referenced the table, watermarks is the updated source -> last processed Time.
         - bool: A boolean value indicating whether the operation was successful.
         - None/Exception: If an error occurred during the operation, it returns the exception; otherwise, it returns None.
+    """
+    sql_text = """
+    select db,digest,any_value(Query),count(*),sum(query_time),%s,max(`Time`) from (select db,digest,Query,query_time,`Time` from INFORMATION_SCHEMA.slow_query where is_internal=0 and  `Time` > greatest(DATE_SUB(NOW(),INTERVAL 1 DAY), cast(%s as datetime(6))) order by `Time` limit 100000)a group by db,digest
+    """
+    global slow_log_digest_cache
+    if digest_cache is None:
+        if slow_log_digest_cache is None:
+            slow_log_digest_cache = DigestTableCache()
+        digest_cache = slow_log_digest_cache
+    watermarks = dict(watermarks or {})
+    cursor = conn.cursor()
+    refs = {}  # (db,table_name) -> 慢查询耗时
+    try:
+        if slow_log_collector is not None:
+            # 收集器读完所有行后自行更新watermarks
+            rows = slow_log_collector.rows(watermarks)
+        else:
+            cursor.execute("select concat(@@hostname,':',@@port)")
+            source = f"slow_query:{cursor.fetchone()[0]}"
+            # 旧版本不区分节点的水位线不能用于当前节点
+            watermarks.pop("slow_query", None)
+            since = watermarks.get(source)
+            cursor.execute(sql_text, (source, since if since is not None else datetime.datetime(1970, 1, 1)))
+            rows = cursor
+        for row in rows:
+            db, digest, query, exec_count, query_time, source, last_time = row
+            if slow_log_collector is None and last_time is not None and (
+                    source not in watermarks or last_time > watermarks[source]):
+                watermarks[source] = last_time
+            tablist = digest_cache.get(digest) if digest else None
+            if tablist is None:
+                if not query:
+                    continue
+                tablist = get_all_tablename(query)
+                if digest:
+                    digest_cache.put(digest, tablist)
+            db = db or None
+            for table in set((table_schema if table_schema is not None else db, table_name)
+                             for table_schema, table_name in tablist):
+                refs[table] = refs.get(table, 0.0) + float(query_time or 0)
+    except Exception as e:
+        return None, False, e
+    finally:
+        cursor.close()
+        digest_cache.flush()
+    log.info(f"慢日志digest缓存累计命中{digest_cache.hits}次，解析{digest_cache.misses}个新digest")
+    # 按catalog解析表名，只保留数据库中存在的表
+    index, success, error = get_table_name_index(conn)
+    if not success:
+        return None, False, error
+    latency = {}
+    for (table_schema, table_name), query_time in refs.items():
+        table = index.resolve(table_schema, table_name)
+        if table is not None:
+            latency[table] = latency.get(table, 0.0) + query_time
+    return (latency, watermarks), True, None
 
-    Raises:
-    Exception: An exception is raised if there is an error executing the SQL query.
+
+# 保存慢日志水位线和按指数衰减累计的表热度，跨轮次(守护进程模式)和跨运行(磁盘存储)复用
+class SlowLogState:
+    """
+    State of the incremental slow log scan: the last processed Time per source (TiDB instance or slow log file) and
+    the accumulated hotness of every table.
+
+    The hotness is the slow query latency in seconds, decayed exponentially with half_life_hours, so a later run
+    only adds the latency of the new entries and still ranks tables by long-term hotness. The state is kept in
+    memory, and in a SQLite file when path is given. Scores decayed below min_score are dropped.
+    """
+
+    def __init__(self, path=None, half_life_hours=24, min_score=0.01):
+        self.path = path
+        self.half_life_hours = half_life_hours
+        self.min_score = min_score
+        self._watermarks = {}
+        self._scores = {}
+        self._updated_at = None
+        self._lock = threading.Lock()
+        if path:
+            try:
+                self._load()
+            except Exception as e:
+                log.warning(f"读取慢日志状态文件{path}失败，重新扫描最近一天的慢日志: {e}")
+                self._watermarks, self._scores, self._updated_at = {}, {}, None
+
+    def _connect(self):
+        import sqlite3
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        disk = sqlite3.connect(self.path, timeout=30)
+        disk.execute("create table if not exists slow_log_watermark (source text primary key, last_time text not null)")
+        disk.execute("create table if not exists slow_log_score (table_schema text not null, table_name text not null, "
+                     "score real not null, primary key (table_schema, table_name))")
+        disk.execute("create table if not exists slow_log_meta (name text primary key, value real not null)")
+        return disk
+
+    def _load(self):
+        disk = self._connect()
+        try:
+            self._watermarks = {source: datetime.datetime.fromisoformat(last_time) for source, last_time in
+                                disk.execute("select source, last_time from slow_log_watermark")}
+            self._scores = {(table_schema, table_name): score for table_schema, table_name, score in
+                            disk.execute("select table_schema, table_name, score from slow_log_score")}
+            row = disk.execute("select value from slow_log_meta where name = 'updated_at'").fetchone()
+            self._updated_at = row[0] if row is not None else None
+        finally:
+            disk.close()
+
+    def _save(self):
+        disk = self._connect()
+        try:
+            disk.execute("delete from slow_log_watermark")
+            disk.executemany("insert into slow_log_watermark (source, last_time) values (?, ?)",
+                             [(source, last_time.isoformat()) for source, last_time in self._watermarks.items()])
+            disk.execute("delete from slow_log_score")
+            disk.executemany("insert into slow_log_score (table_schema, table_name, score) values (?, ?, ?)",
+                             [(table_schema, table_name, score) for (table_schema, table_name), score in
+                              self._scores.items()])
+            disk.execute("insert or replace into slow_log_meta (name, value) values ('updated_at', ?)",
+                         (self._updated_at,))
+            disk.commit()
+        finally:
+            disk.close()
+
+    def watermarks(self):
+        with self._lock:
+            return dict(self._watermarks)
+
+    def update(self, latency, watermarks):
+        """
+        将已有热度衰减到当前时间后累加新的慢查询耗时，保存水位线，返回(table_schema, table_name) -> 热度
+        """
+        with self._lock:
+            now = time.time()
+            if self._updated_at is not None and self.half_life_hours > 0:
+                factor = 0.5 ** (max(now - self._updated_at, 0) / (self.half_life_hours * 3600))
+                self._scores = {table: score * factor for table, score in self._scores.items()}
+            for table, query_time in latency.items():
+                self._scores[table] = self._scores.get(table, 0.0) + query_time
+            self._scores = {table: score for table, score in self._scores.items() if score >= self.min_score}
+            self._watermarks = dict(watermarks)
+            self._updated_at = now
+            if self.path:
+                try:
+                    self._save()
+                except Exception as e:
+                    log.warning(f"保存慢日志状态文件{self.path}失败: {e}")
+            return dict(self._scores)
+
+
+# 按实例和时间片并行读取cluster_slow_query
+class ClusterSlowLogCollector:
+    """
+    Reads the slow log of every TiDB instance from information_schema.cluster_slow_query.
+
+    The lookback window (starting at the watermark of the instance when there is one) is split into slices of
+    slice_minutes, and every (instance, slice) piece is fetched with an INSTANCE and Time predicate so that each TiDB
+    node only scans the part of its slow log file in that slice. The pieces are fetched by `parallel` threads over
+    the connection pool, aggregated per (db, digest) on the server, and rows() yields the rows of each piece once it is completely
+    read. Each piece reads at most limit_per_slice slow log entries. A failed piece is logged and skipped, none of
+    its rows are used; an error is raised only when every piece failed. stats_rows() aggregates the Stats column
+    over the same pieces for get_pseudo_stats_weights.
+
+    The pieces of an instance are returned in time order, and its watermark advances to the end of the last piece
+    returned. It stops before a failed piece, and at the last Time read from a piece truncated by limit_per_slice,
+    so the next run reads the rest of the slice again instead of skipping it; the pieces after it are read again by
+    the next run and are not returned, so no slow query is counted twice.
+    """
+
+    def __init__(self, pool: dbutils.pooled_db.PooledDB, lookback_hours=24, slice_minutes=60, parallel=2,
+                 limit_per_slice=100000):
+        self.pool = pool
+        self.lookback_hours = lookback_hours
+        self.slice_minutes = max(slice_minutes, 1)
+        self.parallel = max(parallel, 1)
+        self.limit_per_slice = limit_per_slice
+
+    def get_pieces(self, watermarks=None):
+        """
+        返回[(instance, slice_begin, slice_end)]，时间以数据库当前时间为准，有水位线的实例从水位线开始
+        """
+        watermarks = watermarks or {}
+        conn = self.pool.connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("select now()")
+            now = cursor.fetchone()[0]
+            cursor.execute("select status_address from information_schema.cluster_info where type = 'tidb'")
+            instances = [row[0] for row in cursor]
+        finally:
+            cursor.close()
+            conn.close()
+        pieces = []
+        lookback = now - datetime.timedelta(hours=self.lookback_hours)
+        step = datetime.timedelta(minutes=self.slice_minutes)
+        for instance in instances:
+            begin = lookback
+            watermark = watermarks.get(f"cluster:{instance}")
+            if watermark is not None and watermark > begin:
+                begin = watermark
+            slice_begin = begin
+            while slice_begin < now:
+                slice_end = min(slice_begin + step, now)
+                pieces.append((instance, slice_begin, slice_end))
+                slice_begin = slice_end
+        # 按时间片交替排列实例，使各个tidb节点的读取负载均匀
+        pieces.sort(key=lambda x: x[1])
+        return pieces
+
+    def _fetch(self, sql_text, pieces: queue.Queue, results: queue.Queue, stop_event: threading.Event):
+        while not stop_event.is_set():
+            try:
+                piece = pieces.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                conn = self.pool.connection()
+                try:
+                    cursor = conn.cursor()
+                    try:
+                        cursor.execute(sql_text, piece)
+                        # 时间片读完后才返回其结果行，失败的时间片下次重新读取，已读到的部分行不能计入热度
+                        rows = cursor.fetchall()
+                    finally:
+                        cursor.close()
+                finally:
+                    conn.close()
+                results.put((piece, rows, None))
+            except Exception as e:
+                log.warning(f"读取{piece[0]}在{piece[1]}~{piece[2]}的慢日志失败: {e}")
+                results.put((piece, None, e))
+
+    def _run(self, sql_text, pieces):
+        """
+        用parallel个线程执行每个时间片的sql_text，按完成顺序返回(piece, rows, error)，失败的时间片rows为None
+        """
+        piece_queue = queue.Queue()
+        for piece in pieces:
+            piece_queue.put(piece)
+        results = queue.Queue()
+        stop_event = threading.Event()
+        threads = [threading.Thread(target=self._fetch, args=(sql_text, piece_queue, results, stop_event), daemon=True)
+                   for i in range(min(self.parallel, len(pieces)))]
+        for t in threads:
+            t.start()
+        try:
+            for i in range(len(pieces)):
+                yield results.get()
+        finally:
+            stop_event.set()
+
+    def rows(self, watermarks=None):
+        """
+        并行读取所有(instance, 时间片)，边读取边返回(db, digest, query, exec_count, query_time, source, last_time)，
+        全部读完后更新watermarks中各实例的水位线
+        """
+        sql_text = f"""
+        select db,digest,any_value(Query),count(*),sum(query_time),concat('cluster:',instance),max(`Time`) from (select instance,db,digest,Query,query_time,`Time`
+        from information_schema.cluster_slow_query where instance = %s and `Time` > %s and `Time` <= %s and is_internal=0
+        order by `Time` limit {int(self.limit_per_slice)}) a group by instance,db,digest
+        """
+        all_pieces = self.get_pieces(watermarks)
+        total = len(all_pieces)
+        instance_pieces = {}  # instance -> 按时间排列的时间片
+        for piece in all_pieces:
+            instance_pieces.setdefault(piece[0], []).append(piece)
+        count = 0
+        failed = 0
+        dropped = 0
+        last_error = None
+        # 每个实例的时间片按时间顺序返回，水位线推进到已返回的最后一个时间片。遇到失败的时间片后停止，
+        # 被limit_per_slice截断的时间片推进到读到的最大Time后停止，之后的时间片下次重新读取，这次不返回
+        pending = {}  # piece -> rows，失败的时间片为None
+        next_index = {instance: 0 for instance in instance_pieces}
+        stopped = set()
+        new_watermarks = {}
+        for piece, rows, error in self._run(sql_text, all_pieces):
+            if error is not None:
+                failed += 1
+                last_error = error
+            pending[piece] = rows
+            instance = piece[0]
+            ordered = instance_pieces[instance]
+            index = next_index[instance]
+            while index < len(ordered) and ordered[index] in pending:
+                rows = pending.pop(ordered[index])
+                if instance in stopped or rows is None:
+                    stopped.add(instance)
+                    if rows is not None:
+                        dropped += 1
+                    index += 1
+                    continue
+                source = f"cluster:{instance}"
+                if sum(row[3] for row in rows) >= self.limit_per_slice:
+                    stopped.add(instance)
+                    last_time = max((row[6] for row in rows if row[6] is not None), default=None)
+                    if last_time is not None:
+                        new_watermarks[source] = last_time
+                else:
+                    new_watermarks[source] = ordered[index][2]
+                count += len(rows)
+                yield from rows
+                index += 1
+            next_index[instance] = index
+        if total and failed == total:
+            raise last_error
+        if watermarks is not None:
+            for source, last_time in new_watermarks.items():
+                if source not in watermarks or last_time > watermarks[source]:
+                    watermarks[source] = last_time
+        log.info(f"从{total}个(实例, 时间片)读取慢日志，失败{failed}个，"
+                 f"{dropped}个在失败或被截断的时间片之后下次重新读取，共{count}行")
+
+    def stats_rows(self):
+        """
+        按相同的(instance, 时间片)并行汇总回溯时间内所有慢日志的Stats，返回(db, stats, query_time)，失败的时间片跳过
+        """
+        sql_text = """
+        select db,stats,sum(query_time) from information_schema.cluster_slow_query
+        where instance = %s and `Time` > %s and `Time` <= %s and is_internal=0 and stats is not null and stats != ''
+        group by db,stats
+        """
+        pieces = self.get_pieces()
+        failed = 0
+        last_error = None
+        for piece, rows, error in self._run(sql_text, pieces):
+            if error is not None:
+                failed += 1
+                last_error = error
+                continue
+            yield from rows
+        if pieces and failed == len(pieces):
+            raise last_error
+
+
+# 慢日志文件中的一条记录，time为带时区的datetime，stats为# Stats的原始文本
+SlowLogEntry = namedtuple("SlowLogEntry", ["time", "user", "db", "query_time", "digest", "stats", "is_internal", "query"])
+
+_SLOW_LOG_TIME_RE = re.compile(r"(\d{4}-\d\d-\d\d[T ]\d\d:\d\d:\d\d)(\.\d+)?(Z|[+-]\d\d:?\d\d)?")
+
+
+def parse_slow_log_time(text):
+    """
+    解析慢日志中的时间，如2019-08-14T09:26:59.487776265+08:00，纳秒截断为微秒，没有时区时按本地时区处理
+    """
+    m = _SLOW_LOG_TIME_RE.match(text.strip())
+    if m is None:
+        return None
+    value = datetime.datetime.strptime(m.group(1).replace(" ", "T"), "%Y-%m-%dT%H:%M:%S")
+    if m.group(2):
+        value = value.replace(microsecond=int(m.group(2)[1:7].ljust(6, "0")))
+    tz = m.group(3)
+    if tz is None:
+        return value.astimezone()
+    if tz == "Z":
+        return value.replace(tzinfo=datetime.timezone.utc)
+    tz = tz.replace(":", "")
+    offset = datetime.timedelta(hours=int(tz[1:3]), minutes=int(tz[3:5]))
+    return value.replace(tzinfo=datetime.timezone(-offset if tz[0] == "-" else offset))
+
+
+def iter_slow_log_file(path):
+    """
+    This function parses a TiDB slow log file and yields its entries as SlowLogEntry.
+
+    The file is memory mapped and scanned line by line with find(), only the header lines that are used
+    (# Time, # User@Host, # DB, # Query_time, # Digest, # Stats, # Is_internal) and the query are decoded,
+    so large files are parsed without reading them into memory. An entry starts at its "# Time:" line, the
+    statement follows the header lines; the "use db;" line TiDB writes before the statement is dropped.
+
+    Parameters:
+    path (str): The slow log file.
+
+    Returns:
+    generator: SlowLogEntry for every entry in the file.
+    """
+    with open(path, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # 空文件不能mmap
+            return
+        try:
+            size = len(mm)
+            pos = 0
+            entry = None
+            query_start = query_end = -1
+            while pos < size:
+                end = mm.find(b"\n", pos)
+                if end == -1:
+                    end = size
+                if mm[pos:pos + 2] == b"# ":
+                    sep = mm.find(b": ", pos, end)
+                    key = mm[pos + 2:sep] if sep != -1 else b""
+                    if key == b"Time":
+                        if entry is not None and query_start != -1:
+                            yield _build_slow_log_entry(entry, mm[query_start:query_end])
+                        entry = {"time": mm[sep + 2:end]}
+                        query_start = query_end = -1
+                    elif entry is not None and query_start == -1 and key in _SLOW_LOG_KEYS:
+                        entry[_SLOW_LOG_KEYS[key]] = mm[sep + 2:end]
+                elif entry is not None and end > pos:
+                    line = mm[pos:end]
+                    if query_start == -1 and line[:4].lower() == b"use " and line.rstrip().endswith(b";"):
+                        pass
+                    else:
+                        if query_start == -1:
+                            query_start = pos
+                        query_end = end
+                pos = end + 1
+            if entry is not None and query_start != -1:
+                yield _build_slow_log_entry(entry, mm[query_start:query_end])
+        finally:
+            mm.close()
+
+
+_SLOW_LOG_KEYS = {b"User@Host": "user", b"DB": "db", b"Query_time": "query_time", b"Digest": "digest",
+                  b"Stats": "stats", b"Is_internal": "is_internal"}
+
+
+def _build_slow_log_entry(entry, query):
+    def text(key):
+        value = entry.get(key)
+        return value.decode("utf-8", "replace").strip() if value is not None else ""
+
+    user = text("user")
+    query_time = text("query_time")
+    return SlowLogEntry(time=parse_slow_log_time(text("time")),
+                        user=user.split("[", 1)[0] if user else "",
+                        db=text("db"),
+                        query_time=float(query_time) if query_time else 0.0,
+                        digest=text("digest"),
+                        stats=text("stats"),
+                        is_internal=text("is_internal") == "true",
+                        query=query.decode("utf-8", "replace").strip())
+
+
+# 从本地慢日志文件读取慢日志，不访问集群
+class SlowLogFileReader:
+    """
+    Reads slow log entries from local tidb-slow.log files (glob patterns are allowed, e.g. rotated files) with
+    iter_slow_log_file, and feeds them to get_tablename_from_slow_log like ClusterSlowLogCollector does, so the
+    hot tables are ranked without putting any load on the cluster.
+
+    The watermark is kept per configured pattern, not per file, and every file matched by the pattern is filtered
+    against it: when TiDB rotates tidb-slow.log to tidb-slow-<time>.log, the entries already read are not read again
+    from the rotated file.
+
+    rows() also sums the Stats of all the entries in the lookback window while it parses the files, stats_rows()
+    returns them without parsing the files again.
+    """
+
+    def __init__(self, paths, lookback_hours=24):
+        self.paths = paths
+        self.lookback_hours = lookback_hours
+        self._stats = None
+
+    def files(self):
+        """
+        返回[(source, 文件列表)]，每个配置的路径(glob)对应一个source
+        """
+        result = []
+        for pattern in self.paths:
+            pattern = os.path.expanduser(pattern)
+            matched = sorted(glob.glob(pattern))
+            if not matched:
+                log.warning(f"慢日志文件{pattern}不存在")
+            result.append((f"file:{os.path.abspath(pattern)}", matched))
+        return result
+
+    def entries(self, watermarks=None, stats=None):
+        """
+        返回回溯时间内(有水位线时为水位线之后)所有非内部SQL的(source, SlowLogEntry)，
+        指定stats时将回溯时间内所有SQL的耗时按(db, Stats)累加到stats中(不受水位线影响)
+        """
+        watermarks = watermarks or {}
+        lookback = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=self.lookback_hours)
+        for source, paths in self.files():
+            watermark = watermarks.get(source)
+            for path in paths:
+                for entry in iter_slow_log_file(path):
+                    if entry.is_internal or entry.time is None or entry.time < lookback:
+                        continue
+                    if stats is not None and entry.stats:
+                        key = (entry.db, entry.stats)
+                        stats[key] = stats.get(key, 0.0) + entry.query_time
+                    if watermark is not None and entry.time <= watermark:
+                        continue
+                    yield source, entry
+
+    def rows(self, watermarks=None):
+        """
+        按source和(db, digest)汇总，返回(db, digest, query, exec_count, query_time, source, last_time)，
+        全部返回后更新watermarks中各source的水位线
+        """
+        groups = {}
+        stats = {}
+        for source, entry in self.entries(watermarks, stats):
+            key = (source, entry.db, entry.digest or entry.query)
+            group = groups.get(key)
+            if group is None:
+                groups[key] = [entry.db, entry.digest, entry.query, 1, entry.query_time, source, entry.time]
+            else:
+                group[3] += 1
+                group[4] += entry.query_time
+                if entry.time > group[6]:
+                    group[6] = entry.time
+        for group in groups.values():
+            yield tuple(group)
+        if watermarks is not None:
+            for group in groups.values():
+                source, last_time = group[5], group[6]
+                if source not in watermarks or last_time > watermarks[source]:
+                    watermarks[source] = last_time
+        self._stats = stats
+
+    def stats_rows(self):
+        """
+        返回回溯时间内按(db, Stats)汇总的(db, stats, query_time)，使用上次rows()解析文件时的结果，没有时解析文件
+        """
+        stats, self._stats = self._stats, None
+        if stats is None:
+            stats = {}
+            for _ in self.entries(stats=stats):
+                pass
+        return [(db, entry_stats, query_time) for (db, entry_stats), query_time in stats.items()]
+
+
+_SLOW_LOG_STATS_RE = re.compile(r"([^,:\[\]]+):([^,\[\]]*)((?:\[[^\]]*\])*)")
+
+
+def parse_slow_log_stats(stats, threshold=90):
+    """
+    This function parses the Stats field of a slow log entry, e.g. "t1:pseudo,t2:443552727523115008[10000;2000]",
+    and returns the tables that were planned with pseudo or outdated statistics.
+
+    The value after the table name is the stats version or "pseudo"; newer versions append [row_count;modify_count],
+    which is judged with the same health threshold as stats_meta.
+
+    Parameters:
+    stats (str): The Stats field.
+    threshold (int, optional): The health score threshold. Defaults to 90.
+
+    Returns:
+    list: A list of tuples (table_name, kind), kind is "pseudo" or "outdated".
+    """
+    result = []
+    if not stats:
+        return result
+    for m in _SLOW_LOG_STATS_RE.finditer(stats):
+        table_name, version, details = m.group(1).strip(), m.group(2).strip(), m.group(3)
+        if version.lower().startswith("pseudo"):
+            result.append((table_name, "pseudo"))
+            continue
+        if details:
+            counts = details[1:details.index("]")].split(";")
+            if len(counts) == 2 and counts[0].isdigit() and counts[1].isdigit():
+                if is_stats_meta_unhealthy(int(counts[1]), int(counts[0]), 1, threshold):
+                    result.append((table_name, "outdated"))
+    return result
+
+
+# 按慢查询耗时计算使用pseudo或过期统计信息的表的权重
+def get_pseudo_stats_weights(conn: pymysql.connect, threshold=90):
+    """
+    This function weights every table by the latency of the slow queries in the last day that were planned with
+    pseudo or outdated statistics on it.
+
+    The Stats column is aggregated in bulk on the server (sum(query_time) per distinct (db, stats)) from
+    slow_query. With slow_log_collector set the rows come from its stats_rows(): ClusterSlowLogCollector
+    aggregates cluster_slow_query over the same (instance, slice) pieces as the latency scan, and SlowLogFileReader
+    returns the Stats summed while rows() parsed the files, so the files are not parsed again. Table names in Stats
+    are not qualified, the db of the statement is used as schema.
+
+    Parameters:
+    conn (pymysql.connect): The database connection object.
+    threshold (int, optional): The health score threshold used for outdated statistics. Defaults to 90.
+
+    Returns:
+    tuple: A tuple containing the following elements:
+        - dict: (table_schema, table_name) -> total query time in seconds.
+        - bool: A boolean value indicating whether the operation was successful.
+        - None/Exception: If an error occurred during the operation, it returns the exception; otherwise, it returns None.
     """
     sql_text = """
-    select user,db,query_time,Query from (select user,db,query_time,Query,row_number() over (partition by digest) as nbr from INFORMATION_SCHEMA.slow_query where is_internal=0 and  `Time` > DATE_SUB(NOW(),INTERVAL 1 DAY) limit 10000)a where nbr = 1
+    select db,stats,sum(query_time) from information_schema.slow_query
+    where is_internal=0 and `Time` > DATE_SUB(NOW(),INTERVAL 1 DAY) and stats is not null and stats != ''
+    group by db,stats
+    """
+    index, succ, msg = get_table_name_index(conn)
+    if not succ:
+        return None, False, msg
+    weights = {}
+    cursor = conn.cursor()
+    try:
+        if slow_log_collector is not None:
+            rows = slow_log_collector.stats_rows()
+        else:
+            cursor.execute(sql_text)
+            rows = cursor
+        for db, stats, query_time in rows:
+            for table_name, kind in parse_slow_log_stats(stats, threshold):
+                key = index.resolve(db or None, table_name)
+                if key is not None:
+                    weights[key] = weights.get(key, 0.0) + float(query_time or 0)
+    except Exception as e:
+        return None, False, e
+    finally:
+        cursor.close()
+    return weights, True, None
+
+
+# 从statements_summary中获取执行过的表，服务端聚合，不需要解析SQL文本
+def get_tablename_from_statements_summary(conn: pymysql.connect, lookback_hours=24):
+    """
+    This function retrieves the tables referenced by recent statements from
+    information_schema.cluster_statements_summary and cluster_statements_summary_history.
+
+    Instead of pulling raw query texts, exec_count and sum_latency are summed per distinct TABLE_NAMES value on the
+    server, so only one row per table combination is transferred. The TABLE_NAMES values ("db.table,db.table") are
+    then split and the statistics are added up per table. Tables that no longer exist are filtered out.
+
+    Parameters:
+    conn (pymysql.connect): The database connection object.
+    lookback_hours (int): Only summaries whose window ends within this many hours are used.
+
+    Returns:
+    tuple: A tuple containing the following elements:
+        - list: A list of tuples (table_schema, table_name, exec_count, sum_latency), ordered by sum_latency descending.
+          sum_latency is in nanoseconds.
+        - bool: A boolean value indicating whether the operation was successful.
+        - None/Exception: If an error occurred during the operation, it returns the exception; otherwise, it returns None.
+    """
+    sql_text = f"""
+    select table_names,sum(exec_count),sum(sum_latency) from (
+        select table_names,exec_count,sum_latency from information_schema.cluster_statements_summary
+        where table_names is not null and table_names != ''
+        union all
+        select table_names,exec_count,sum_latency from information_schema.cluster_statements_summary_history
+        where table_names is not null and table_names != '' and summary_end_time > DATE_SUB(NOW(),INTERVAL {int(lookback_hours)} HOUR)
+    )a group by table_names
     """
+    index, succ, msg = get_table_name_index(conn)
+    if not succ:
+        return None, False, msg
+    stats = {}
     cursor = conn.cursor()
-    result = []  # 返回(db,table_name)
     try:
         cursor.execute(sql_text)
         for row in cursor:
-            user, db, query_time, query = row
-            tablist = get_all_tablename(query)
-            # 对tablist去重
-            tablist = list(set(tablist))
-            for table_name in tablist:
-                result.append(table_name)
+            table_names, exec_count, sum_latency = row
+            for item in table_names.split(","):
+                table_schema, _, table_name = item.strip().partition(".")
+                table = index.resolve(table_schema, table_name)
+                if table is None:
+                    continue
+                count, latency = stats.get(table, (0, 0))
+                stats[table] = (count + int(exec_count or 0), latency + int(sum_latency or 0))
     except Exception as e:
         return None, False, e
     finally:
         cursor.close()
-    # 对result去重
-    result = list(set(result))
-    # 从数据库中获取所有表名
-    all_tables, success, error = get_all_tables_from_database(conn)
-    if not success:
-        return None, False, error
-    # 将all_tables转换为字典
-    all_tables_dict = {}
-    # 如果表名重复，以最后一次为准
-    for table_schema, table_name in all_tables:
-        all_tables_dict[table_name] = table_schema
-    # 对result进行过滤，只保留数据库中存在的表模式和表名
-    result = [(all_tables_dict[table_name], table_name) for table_name in result if table_name in all_tables_dict]
+    result = [(table_schema, table_name, exec_count, sum_latency)
+              for (table_schema, table_name), (exec_count, sum_latency) in stats.items()]
+    result.sort(key=lambda x: x[3], reverse=True)
     return result, True, None
 
 def do_analyze(pool: dbutils.pooled_db.PooledDB, start_time="20:00", end_time="08:00", slow_query_table_first=False,
                order=True,
-               preview=False, parallel=1):
+               preview=False, parallel=1, coordinator=None, analyze_queue=None, status_snapshot=None,
+               defer_running=False):
     """
     执行统计信息搜集
     :param pool: 数据库连接池
@@ -670,6 +1815,10 @@ def do_analyze(pool: dbutils.pooled_db.PooledDB, start_time="20:00", end_time="0
     :param end_time: 统计信息搜集结束时间,格式为:23:03,如果end_time < start_time,那么表示跨天，比如start_time=23:03,end_time=01:03说明当前时间在这个时间段内可做统计信息搜集
     :param order: 是否按照表记录数大小排序，如果为True，那么会按照表记录数大小排序，先做记录数小的表的统计信息搜集
     :param preview: 是否预览，如果为True，那么只打印统计信息搜集语句，不执行
+    :param coordinator: 多实例协同的LeaseCoordinator，为None时不做协同
+    :param analyze_queue: 待搜集对象队列(AnalyzeQueue)，可通过它配置按成本分lane调度，为None时使用默认配置
+    :param status_snapshot: AnalyzeStatusSnapshot，执行前跳过统计信息已锁定和正在搜集的对象，为None时不检查
+    :param defer_running: 对正在搜集的对象延后重试而不是跳过
     :return: 执行中是否报错True or False; ####返回结果（table_schema, table_name, partition_name, col_list, sql_text, succ, msg）
     """
     conn = pool.connection()
@@ -678,37 +1827,1173 @@ def do_analyze(pool: dbutils.pooled_db.PooledDB, start_time="20:00", end_time="0
         log.info(f"当前脚本为预览模式，不会真正做统计信息搜集")
     log.info(f"需要做统计信息搜集的对象数为: {len(result)}")
     if not succ:
+        conn.close()
         return False
-    from concurrent.futures import ThreadPoolExecutor
-    with ThreadPoolExecutor(max_workers=parallel) as exector:
+    if preview:
         for table_schema, table_name, partition_name, table_rows, col_list, sql_text in result:
-            if preview:
-                log.info(f"预览: {sql_text}，搜集前表记录数: {table_schema}.{table_name} = {table_rows}")
-            else:
-                def to_exec(pool: dbutils.pooled_db.PooledDB, sql_text, table_schema, table_name, table_rows,
-                            start_time, end_time):
-                    if not in_time_range(start_time, end_time):
-                        msg = f"当前时间:{datetime.datetime.now()}，不在指定时间范围内[{start_time}-{end_time}]，不执行统计信息搜集: {sql_text}，表记录数: {table_schema}.{table_name} = {table_rows}"
-                        log.warning(msg)
-                        return False
-                    conn = pool.connection()
-                    try:
-                        t1 = time.time()
-                        cursor = conn.cursor()
-                        cursor.execute(sql_text)
-                        t2 = time.time()
-                        log.info(
-                            f"执行: {sql_text}，搜集前表记录数: {table_schema}.{table_name} = {table_rows}，耗时: {round(t2 - t1, 2)}秒")
-                        cursor.close()
-                    except Exception as e:
-                        log.error(f"执行:{sql_text},失败，msg:{e}")
-                    conn.close()
+            if status_snapshot is not None and status_snapshot.check((table_schema, table_name, partition_name)):
+                log.info(f"预览: 统计信息已锁定或正在搜集，跳过: {sql_text}")
+                continue
+            log.info(f"预览: {sql_text}，搜集前表记录数: {table_schema}.{table_name} = {table_rows}")
+        conn.close()
+        return True
+    hot_tables = get_hot_tables(conn, slow_query_table_first)
+    conn.close()
+    if analyze_queue is None:
+        analyze_queue = AnalyzeQueue(parallel)
+    for analyze_object in result:
+        analyze_queue.put(analyze_object, get_analyze_priority(analyze_object, hot_tables, order))
+    if coordinator is not None:
+        coordinator.start(analyze_queue)
+    stop_event = threading.Event()
+    workers = start_analyze_workers(pool, analyze_queue, parallel, start_time, end_time, preview, stop_event,
+                                    coordinator=coordinator, status_snapshot=status_snapshot,
+                                    defer_running=defer_running)
+    try:
+        for worker in workers:
+            # 使用带超时的join，保证主线程能及时响应超时信号和ctrl+c
+            while worker.is_alive():
+                worker.join(1)
+    finally:
+        stop_event.set()
+        analyze_queue.close()
+        if coordinator is not None:
+            coordinator.stop()
+    return True
+
+
+# 待搜集对象的优先级队列
+class AnalyzeQueue:
+    """
+    A thread-safe priority queue of the objects that need to be analyzed.
+
+    Producers (the full discovery and the daemon poller) put objects in, analyze workers take them out.
+    Objects are identified by (table_schema, table_name, partition_name): an object that is already
+    running is not queued again, and an object that is already queued only keeps its best priority.
+    An object can be put back with a delay, it is not handed out again before the delay expires.
+
+    To avoid head-of-line blocking the objects are split into lanes by cost class (table_rows): small objects
+    (< small_rows) have fast_slots of the parallel slots reserved for them, large objects (>= large_rows) may occupy
+    at most large_slots slots, medium objects use the rest. When a lane drains its reservation or limit is lifted
+    and the other lanes may use all the slots.
+
+    With a StorePlacement the queue also spreads the running objects across TiKV stores: among the next ready
+    objects it picks the one whose region leaders overlap least with the running objects, and never runs more than
+    the per-store concurrency cap on one store.
+    """
+
+    def __init__(self, parallel=1, small_rows=1000000, large_rows=100000000, fast_slots=None, large_slots=None,
+                 placement=None):
+        self._cond = threading.Condition()
+        self.placement = placement
+        self._store_running = {}  # store_id -> 正在执行且在该store上有leader的对象数
+        self.parallel = max(parallel, 1)
+        self.small_rows = small_rows
+        self.large_rows = large_rows
+        if fast_slots is None:
+            fast_slots = 1
+        if large_slots is None:
+            large_slots = max(self.parallel // 2, 1)
+        # 至少保留一个非小对象可用的槽位
+        self.fast_slots = min(max(fast_slots, 0), self.parallel - 1)
+        self.large_slots = min(max(large_slots, 1), self.parallel)
+        self._lane_queued = {'small': 0, 'medium': 0, 'large': 0}
+        self._lane_running = {'small': 0, 'medium': 0, 'large': 0}
+        # 按(priority, seq, key)升序排列，seq保证相同优先级时先进先出
+        self._entries = []
+        self._queued = {}  # key -> (priority, seq, key)
+        self._objects = {}  # key -> analyze_object
+        self._not_before = {}  # key -> 延迟到该时间之后才能执行
+        self._running = {}  # key -> (priority, analyze_object, stores)
+        self._seq = 0
+        self._closed = False
+
+    def put(self, analyze_object, priority):
+        """
+        Queue an object, returns True if the object was queued (or its priority was raised).
+        """
+        with self._cond:
+            return self._put(analyze_object, priority)
+
+    def _put(self, analyze_object, priority, not_before=None):
+        key = tuple(analyze_object[:3])
+        if self._closed or key in self._running:
+            return False
+        entry = self._queued.get(key)
+        if entry is not None:
+            if entry[0] <= priority:
+                return False
+            self._entries.remove(entry)
+        else:
+            self._lane_queued[self.get_lane(analyze_object)] += 1
+        self._seq += 1
+        entry = (priority, self._seq, key)
+        bisect.insort(self._entries, entry)
+        self._queued[key] = entry
+        self._objects[key] = analyze_object
+        if not_before is None:
+            self._not_before.pop(key, None)
+        else:
+            self._not_before[key] = not_before
+        self._cond.notify()
+        return True
+
+    def discard(self, key):
+        """
+        Remove a queued object, for example when it became healthy again. Running objects are not affected.
+        """
+        with self._cond:
+            entry = self._queued.pop(tuple(key), None)
+            if entry is None:
+                return False
+            self._entries.remove(entry)
+            self._lane_queued[self.get_lane(self._objects.pop(entry[2]))] -= 1
+            self._not_before.pop(entry[2], None)
+            return True
+
+    def peek(self, n):
+        """
+        Return up to n queued objects in priority order without taking them.
+        """
+        with self._cond:
+            return [self._objects[key] for priority, seq, key in self._entries[:n]]
+
+    def get(self, timeout=None):
+        """
+        Take the next object to analyze, waiting up to timeout seconds. Returns None if nothing is available.
+        """
+        with self._cond:
+            index = self._select()
+            if index is None and not self._closed:
+                wait = timeout
+                if self._not_before:
+                    # 最多等到最早的延迟对象到期
+                    wait = max(min(self._not_before.values()) - time.time(), 0.01)
+                    if timeout is not None:
+                        wait = min(wait, timeout)
+                self._cond.wait(wait)
+                index = self._select()
+            if index is None:
+                return None
+            priority, seq, key = self._entries.pop(index)
+            del self._queued[key]
+            self._not_before.pop(key, None)
+            analyze_object = self._objects.pop(key)
+            stores = self.placement.stores_of(analyze_object) if self.placement is not None else {}
+            for store_id in stores:
+                self._store_running[store_id] = self._store_running.get(store_id, 0) + 1
+            self._running[key] = (priority, analyze_object, stores)
+            lane = self.get_lane(analyze_object)
+            self._lane_queued[lane] -= 1
+            self._lane_running[lane] += 1
+            if not self._lane_queued[lane]:
+                # lane已排空，唤醒等待中的线程重新分配槽位
+                self._cond.notify_all()
+            return analyze_object
+
+    def get_lane(self, analyze_object):
+        """
+        Return the cost class lane of an object: 'small', 'medium' or 'large'.
+        """
+        table_rows = analyze_object[3] or 0
+        if table_rows < self.small_rows:
+            return 'small'
+        if table_rows >= self.large_rows:
+            return 'large'
+        return 'medium'
+
+    def _lane_available(self, lane):
+        # 判断当前是否可以再执行一个该lane的对象
+        if lane == 'small':
+            return True
+        running = self._lane_running
+        if self._lane_queued['small'] and running['medium'] + running['large'] >= self.parallel - self.fast_slots:
+            # 为小对象保留fast_slots个槽位，小对象队列为空时不再保留
+            return False
+        if lane == 'large' and running['large'] >= self.large_slots:
+            # 大对象最多占用large_slots个槽位，小对象和中等对象队列都为空时不再限制
+            return not self._lane_queued['small'] and not self._lane_queued['medium']
+        return True
+
+    def _select(self):
+        # 返回下一个要执行的对象在self._entries中的下标，跳过尚未到期的延迟对象和没有可用槽位的lane
+        if self._closed:
+            return None
+        now = time.time()
+        available = {}
+        best, best_score, candidates = None, None, 0
+        for index, (priority, seq, key) in enumerate(self._entries):
+            if self._not_before.get(key, 0) > now:
+                continue
+            lane = self.get_lane(self._objects[key])
+            if lane not in available:
+                available[lane] = self._lane_available(lane)
+            if not available[lane]:
+                if len(available) == 3 and not any(available.values()):
+                    break
+                continue
+            if self.placement is None:
+                return index
+            # 在前lookahead个候选对象中选择与正在执行的对象争抢store最少的对象，超过store并发上限的对象不执行，
+            # 也不占用lookahead，继续向后查找可执行的对象
+            score = self.placement.score(self._objects[key], self._store_running)
+            if score is None:
+                continue
+            if best is None or score < best_score:
+                best, best_score = index, score
+                if score == 0:
+                    break
+            candidates += 1
+            if candidates >= self.placement.lookahead:
+                break
+        return best
+
+    def _stop_running(self, key):
+        # 对象结束执行，释放其占用的lane和store
+        running = self._running.pop(key, None)
+        if running is None:
+            return None
+        priority, analyze_object, stores = running
+        self._lane_running[self.get_lane(analyze_object)] -= 1
+        for store_id in stores:
+            self._store_running[store_id] -= 1
+        return running
+
+    def task_done(self, analyze_object):
+        """
+        Mark an object returned by get() as finished.
+        """
+        with self._cond:
+            self._stop_running(tuple(analyze_object[:3]))
+            self._cond.notify_all()
+
+    def requeue(self, analyze_object, delay=0):
+        """
+        Put an object returned by get() back into the queue with its original priority,
+        it is handed out again after delay seconds.
+        """
+        key = tuple(analyze_object[:3])
+        with self._cond:
+            running = self._stop_running(key)
+            if running is None:
+                return False
+            self._cond.notify_all()
+            return self._put(analyze_object, running[0], time.time() + delay if delay > 0 else None)
+
+    def close(self):
+        """
+        Stop handing out objects and wake up all waiting workers.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def qsize(self):
+        with self._cond:
+            return len(self._entries)
+
+    def __contains__(self, key):
+        with self._cond:
+            key = tuple(key)
+            return key in self._queued or key in self._running
+
+    def idle(self):
+        """
+        Returns True if nothing is queued or running.
+        """
+        with self._cond:
+            return not self._entries and not self._running
+
+
+# 执行单个对象的统计信息搜集
+def exec_analyze_object(pool: dbutils.pooled_db.PooledDB, analyze_object, preview=False):
+    """
+    This function runs the analyze statement of a single object on a pooled connection.
+
+    Parameters:
+    pool (dbutils.pooled_db.PooledDB): The database connection pool.
+    analyze_object (tuple): (table_schema, table_name, partition_name, table_rows, col_list, sql_text).
+    preview (bool, optional): If set to True, only log the statement. Defaults to False.
+
+    Returns:
+    bool: True if the statement was executed successfully, False otherwise.
+    """
+    table_schema, table_name, partition_name, table_rows, col_list, sql_text = analyze_object
+    if preview:
+        log.info(f"预览: {sql_text}，搜集前表记录数: {table_schema}.{table_name} = {table_rows}")
+        return True
+    conn = pool.connection()
+    try:
+        t1 = time.time()
+        cursor = conn.cursor()
+        cursor.execute(sql_text)
+        t2 = time.time()
+        log.info(
+            f"执行: {sql_text}，搜集前表记录数: {table_schema}.{table_name} = {table_rows}，耗时: {round(t2 - t1, 2)}秒")
+        cursor.close()
+    except Exception as e:
+        log.error(f"执行:{sql_text},失败，msg:{e}")
+        return False
+    finally:
+        conn.close()
+    return True
+
+
+# 统计信息搜集线程，从队列中获取对象并执行
+def analyze_worker(pool: dbutils.pooled_db.PooledDB, analyze_queue: AnalyzeQueue, start_time, end_time, preview,
+                   stop_event: threading.Event, daemon=False, coordinator=None, status_snapshot=None,
+                   defer_running=False):
+    """
+    This function is the body of an analyze worker thread.
+
+    In one-shot mode the worker exits when the queue is drained, or stops the whole run when the time window is over.
+    In daemon mode the worker waits for the next time window and for new objects until stop_event is set.
+
+    Parameters:
+    pool (dbutils.pooled_db.PooledDB): The database connection pool.
+    analyze_queue (AnalyzeQueue): The queue of objects that need to be analyzed.
+    start_time (str): The start of the allowed time window.
+    end_time (str): The end of the allowed time window.
+    preview (bool): If set to True, only log the statements.
+    stop_event (threading.Event): Set to stop the worker.
+    daemon (bool, optional): Whether the worker runs in daemon mode. Defaults to False.
+    coordinator (LeaseCoordinator, optional): Take a lease before analyzing an object when several instances share the work.
+    status_snapshot (AnalyzeStatusSnapshot, optional): Skip locked objects and objects that are already being analyzed.
+    defer_running (bool, optional): Put objects that are already being analyzed back into the queue instead of dropping them.
+    """
+    while not stop_event.is_set():
+        if daemon and not in_time_range(start_time, end_time):
+            # 守护进程模式下不在时间窗口内则等待下一个时间窗口
+            stop_event.wait(60)
+            continue
+        if not daemon and analyze_queue.idle():
+            return
+        analyze_object = analyze_queue.get(timeout=1)
+        if analyze_object is None:
+            continue
+        if status_snapshot is not None:
+            status = status_snapshot.check(analyze_object)
+            if status == 'running' and defer_running:
+                log.debug(f"对象正在搜集统计信息，稍后重试: {analyze_object[-1]}")
+                analyze_queue.requeue(analyze_object, status_snapshot.refresh_interval)
+                continue
+            if status is not None:
+                reason = "统计信息已锁定" if status == 'locked' else "TiDB正在搜集统计信息"
+                log.info(f"{reason}，跳过: {analyze_object[-1]}")
+                analyze_queue.task_done(analyze_object)
+                continue
+        if coordinator is not None and not coordinator.acquire(analyze_object, analyze_queue):
+            continue
+        if daemon and not in_time_range(start_time, end_time):
+            # 取出对象后时间窗口刚好结束，放回队列等待下一个时间窗口
+            analyze_queue.requeue(analyze_object)
+            continue
+        try:
+            if not in_time_range(start_time, end_time):
+                table_schema, table_name, partition_name, table_rows, col_list, sql_text = analyze_object
+                log.warning(
+                    f"当前时间:{datetime.datetime.now()}，不在指定时间范围内[{start_time}-{end_time}]，不执行统计信息搜集: {sql_text}，表记录数: {table_schema}.{table_name} = {table_rows}，后面表均不执行")
+                stop_event.set()
+                analyze_queue.close()
+                return
+            succ = exec_analyze_object(pool, analyze_object, preview)
+            if coordinator is not None:
+                coordinator.release(analyze_object, done=succ)
+        finally:
+            analyze_queue.task_done(analyze_object)
+
+
+# 启动统计信息搜集线程
+def start_analyze_workers(pool: dbutils.pooled_db.PooledDB, analyze_queue: AnalyzeQueue, parallel, start_time,
+                          end_time, preview, stop_event: threading.Event, daemon=False, coordinator=None,
+                          status_snapshot=None, defer_running=False):
+    """
+    This function starts `parallel` analyze worker threads and returns them.
+    """
+    workers = []
+    for i in range(max(parallel, 1)):
+        worker = threading.Thread(target=analyze_worker, name=f"analyze-worker-{i}",
+                                  args=(pool, analyze_queue, start_time, end_time, preview, stop_event, daemon,
+                                        coordinator, status_snapshot, defer_running),
+                                  daemon=True)
+        worker.start()
+        workers.append(worker)
+    return workers
+
+
+# 多实例协同的租约存储，claim/renew/release在多个实例并发调用时保证同一对象只有一个实例持有
+class LeaseBackend(abc.ABC):
+    """
+    Base class of the lease storage used to coordinate several tidb_analyze instances.
+
+    A lease row is keyed by (table_schema, table_name, partition_name) and records its owner, its state
+    ('running' or 'done') and the time it expires. The current time is always taken from the backend,
+    so the clocks of the hosts running tidb_analyze do not need to agree. Subclasses provide the
+    connection and the dialect specific SQL (now_sql and insert_ignore_sql, usually as class attributes).
+    """
+    placeholder = "%s"
+
+    def __init__(self, table):
+        self.table = table
+
+    @property
+    @abc.abstractmethod
+    def now_sql(self):
+        """SQL expression of the current unix timestamp in seconds"""
+
+    @property
+    @abc.abstractmethod
+    def insert_ignore_sql(self):
+        """INSERT statement keyword skipping the rows with an existing primary key"""
+
+    @abc.abstractmethod
+    def connection(self):
+        """Return a new DB-API connection to the lease table, closed after use"""
+
+    def _execute(self, statements):
+        # 在同一个连接上依次执行(sql, args)，返回最后一条语句的结果
+        conn = self.connection()
+        try:
+            cursor = conn.cursor()
+            rows = []
+            for sql_text, args in statements:
+                cursor.execute(sql_text, args)
+                rows = cursor.fetchall() if cursor.description else []
+            cursor.close()
+            conn.commit()
+            return rows
+        finally:
+            conn.close()
+
+    def _where_keys(self, keys):
+        p = self.placeholder
+        cond = " or ".join([f"(table_schema={p} and table_name={p} and partition_name={p})"] * len(keys))
+        return f"({cond})", [v for key in keys for v in key]
+
+    def ensure_table(self):
+        self._execute([(f"""
+        create table if not exists {self.table} (
+            table_schema varchar(64) not null,
+            table_name varchar(64) not null,
+            partition_name varchar(64) not null default '',
+            owner varchar(128) not null,
+            state varchar(16) not null,
+            expire_at bigint not null,
+            primary key (table_schema, table_name, partition_name)
+        )
+        """, [])])
+
+    def claim(self, keys, owner, ttl):
+        """
+        Try to take the leases of keys for ttl seconds. Expired leases are taken over, and the 'done' leases of
+        owner are taken back (the object became stale again within done_ttl).
+
+        Returns:
+        dict: key -> (owner, state) of every key that has a lease after the claim.
+        """
+        p = self.placeholder
+        where, args = self._where_keys(keys)
+        values = ",".join([f"({p},{p},{p},{p},'running',{self.now_sql}+{p})"] * len(keys))
+        rows = self._execute([
+            (f"delete from {self.table} where {where} and expire_at < {self.now_sql}", args),
+            (f"update {self.table} set state = 'running', expire_at = {self.now_sql}+{p} where owner = {p} and state = 'done' and {where}",
+             [ttl, owner] + args),
+            (f"{self.insert_ignore_sql} into {self.table}(table_schema,table_name,partition_name,owner,state,expire_at) values {values}",
+             [v for key in keys for v in (key[0], key[1], key[2], owner, ttl)]),
+            (f"select table_schema,table_name,partition_name,owner,state from {self.table} where {where}", args),
+        ])
+        return {(row[0], row[1], row[2]): (row[3], row[4]) for row in rows}
+
+    def renew(self, keys, owner, ttl):
+        """
+        Extend the running leases of keys held by owner, returns the set of keys that are still held.
+        """
+        p = self.placeholder
+        where, args = self._where_keys(keys)
+        rows = self._execute([
+            (f"update {self.table} set expire_at = {self.now_sql}+{p} where owner = {p} and state = 'running' and {where}",
+             [ttl, owner] + args),
+            (f"select table_schema,table_name,partition_name from {self.table} where owner = {p} and state = 'running' and {where}",
+             [owner] + args),
+        ])
+        return {(row[0], row[1], row[2]) for row in rows}
+
+    def release(self, keys, owner, done_ttl=0):
+        """
+        Release the leases of keys held by owner. With done_ttl > 0 the lease is kept as 'done' for done_ttl
+        seconds so that other instances skip the objects, otherwise it is deleted.
+        """
+        p = self.placeholder
+        where, args = self._where_keys(keys)
+        if done_ttl > 0:
+            self._execute([(f"update {self.table} set state = 'done', expire_at = {self.now_sql}+{p} where owner = {p} and {where}",
+                            [done_ttl, owner] + args)])
+        else:
+            self._execute([(f"delete from {self.table} where owner = {p} and {where}", [owner] + args)])
+
+
+# 租约表保存在目标集群中
+class TiDBLeaseBackend(LeaseBackend):
+    """
+    Lease storage in a table of the target TiDB cluster, shared by all tidb_analyze instances.
+    """
+    now_sql = "unix_timestamp()"
+    insert_ignore_sql = "insert ignore"
+
+    def __init__(self, pool: dbutils.pooled_db.PooledDB, table="tidb_analyze.analyze_lease"):
+        super().__init__(table)
+        self.pool = pool
+
+    def connection(self):
+        return self.pool.connection()
+
+    def ensure_table(self):
+        if '.' in self.table:
+            self._execute([(f"create database if not exists {self.table.split('.')[0]}", [])])
+        super().ensure_table()
+
+
+# 本地sqlite租约存储，用于测试或同一主机上的多个实例
+class SQLiteLeaseBackend(LeaseBackend):
+    """
+    Lease storage in a local SQLite file, a stand-in for TiDBLeaseBackend in tests.
+    """
+    placeholder = "?"
+    now_sql = "cast(strftime('%s','now') as integer)"
+    insert_ignore_sql = "insert or ignore"
+
+    def __init__(self, path, table="analyze_lease"):
+        super().__init__(table)
+        self.path = path
+
+    def connection(self):
+        import sqlite3
+        return sqlite3.connect(self.path, timeout=30)
+
+
+# 多实例协同，统计信息搜集前先获取对象的租约
+class LeaseCoordinator:
+    """
+    Coordinates several tidb_analyze instances through a LeaseBackend so that they split the plan without
+    analyzing the same object twice.
+
+    Workers claim objects in batches (the object they took from the queue plus the next ones in the queue),
+    a background thread renews the running leases of the objects this instance holds. Objects leased by another
+    instance are put back into the queue with a delay; objects already finished by another instance are dropped.
+    """
+
+    def __init__(self, backend: LeaseBackend, ttl=300, batch_size=10, done_ttl=3600, owner=None):
+        self.backend = backend
+        self.ttl = ttl
+        self.batch_size = max(batch_size, 1)
+        self.done_ttl = done_ttl
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._held = set()
+        self._stop_event = threading.Event()
+        self._queue = None
+
+    def start(self, analyze_queue: AnalyzeQueue):
+        """
+        Create the lease table if needed and start renewing leases.
+        """
+        self.backend.ensure_table()
+        self._queue = analyze_queue
+        threading.Thread(target=self._renew_loop, name="lease-renewer", daemon=True).start()
+        log.info(f"多实例协同已开启，实例标识: {self.owner}，租约时长: {self.ttl}秒")
+
+    def acquire(self, analyze_object, analyze_queue: AnalyzeQueue):
+        """
+        Make sure this instance holds the lease of an object returned by analyze_queue.get().
+        If not, the object is put back into (or dropped from) analyze_queue and False is returned.
+        """
+        key = tuple(analyze_object[:3])
+        with self._lock:
+            if key in self._held:
+                return True
+            batch = [key]
+            for queued_object in analyze_queue.peek(self.batch_size * 2):
+                queued_key = tuple(queued_object[:3])
+                if len(batch) >= self.batch_size:
+                    break
+                if queued_key not in self._held:
+                    batch.append(queued_key)
+        try:
+            leases = self.backend.claim(batch, self.owner, self.ttl)
+        except Exception as e:
+            log.warning(f"获取租约失败: {e}")
+            analyze_queue.requeue(analyze_object, min(self.ttl, 60))
+            return False
+        with self._lock:
+            for lease_key, (owner, state) in leases.items():
+                if owner == self.owner and state == 'running':
+                    self._held.add(lease_key)
+            if key in self._held:
+                return True
+        owner, state = leases.get(key, (None, None))
+        if state == 'done' and owner != self.owner:
+            log.info(f"对象已由实例{owner}完成统计信息搜集，跳过: {key}")
+            analyze_queue.task_done(analyze_object)
+        else:
+            log.debug(f"对象的租约被实例{owner}持有，稍后重试: {key}")
+            analyze_queue.requeue(analyze_object, min(self.ttl, 60))
+        return False
+
+    def release(self, analyze_object, done=True):
+        """
+        Release the lease of an analyzed object, successfully analyzed objects are kept as 'done'.
+        """
+        key = tuple(analyze_object[:3])
+        with self._lock:
+            self._held.discard(key)
+        try:
+            self.backend.release([key], self.owner, self.done_ttl if done else 0)
+        except Exception as e:
+            log.warning(f"释放租约失败: {key}，msg:{e}")
+
+    def _renew_loop(self):
+        while not self._stop_event.wait(max(self.ttl / 3, 1)):
+            with self._lock:
+                held = set(self._held)
+            if not held:
+                continue
+            # 已经不在队列中的对象(如恢复健康被移出队列)不再续约
+            dropped = {key for key in held if key not in self._queue}
+            try:
+                if dropped:
+                    self.backend.release(list(dropped), self.owner)
+                renewed = self.backend.renew(list(held - dropped), self.owner, self.ttl) if held - dropped else set()
+            except Exception as e:
+                log.warning(f"续约失败: {e}")
+                continue
+            with self._lock:
+                lost = self._held & (held - dropped - renewed)
+                for key in lost:
+                    log.warning(f"租约已失效: {key}")
+                self._held -= dropped | lost
+
+    def stop(self):
+        """
+        Stop renewing and give back the leases of the objects that were claimed but not analyzed.
+        """
+        self._stop_event.set()
+        with self._lock:
+            held = list(self._held)
+            self._held.clear()
+        if held:
+            try:
+                self.backend.release(held, self.owner)
+            except Exception as e:
+                log.warning(f"释放租约失败: {e}")
+
+
+# 正在执行的统计信息搜集任务(包括TiDB自动搜集)和锁定统计信息的表的快照，定期刷新
+class AnalyzeStatusSnapshot:
+    """
+    A cached snapshot of the analyze jobs in progress (`show analyze status`, including TiDB auto analyze) and
+    of the tables whose statistics are locked (`show stats_locked`), refreshed at most every refresh_interval
+    seconds. It is checked before an object is dispatched so that tidb_analyze does not start an ANALYZE on an
+    object TiDB is already analyzing, and never analyzes locked tables.
+    """
+
+    def __init__(self, pool: dbutils.pooled_db.PooledDB, refresh_interval=30):
+        self.pool = pool
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._running = set()  # (table_schema, table_name, partition_name)
+        self._locked = set()  # (table_schema, table_name, partition_name)
+        self._loaded_at = 0
+        self._stats_locked_supported = True
+
+    def refresh(self):
+        """
+        Reload the snapshot, returns (succ, error).
+        """
+        running, locked = set(), set()
+        conn = self.pool.connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("show analyze status where state in ('pending','running')")
+            for row in cursor:
+                table_schema, table_name, partition_name = row[:3]
+                running.add((table_schema, table_name, partition_name or ''))
+            if self._stats_locked_supported:
+                try:
+                    cursor.execute("show stats_locked")
+                    for row in cursor:
+                        table_schema, table_name, partition_name = row[:3]
+                        locked.add((table_schema, table_name, partition_name or ''))
+                except pymysql.err.MySQLError as e:
+                    # tidb低于v6.5.0时不支持锁定统计信息
+                    log.info(f"当前版本不支持show stats_locked，不检查锁定统计信息的表: {e}")
+                    self._stats_locked_supported = False
+        except Exception as e:
+            return False, e
+        finally:
+            cursor.close()
+            conn.close()
+        self._running, self._locked = running, locked
+        self._loaded_at = time.time()
+        return True, None
+
+    def check(self, analyze_object):
+        """
+        Returns 'locked' if the statistics of the object are locked, 'running' if the object (or the table it
+        belongs to) is being analyzed, otherwise None.
+        """
+        with self._lock:
+            if time.time() - self._loaded_at >= self.refresh_interval:
+                succ, msg = self.refresh()
+                if not succ:
+                    # 刷新失败时沿用旧快照，避免频繁重试
+                    log.warning(f"获取正在执行的统计信息搜集任务失败: {msg}")
+                    self._loaded_at = time.time()
+            running, locked = self._running, self._locked
+        table_schema, table_name, partition_name = analyze_object[:3]
+        if (table_schema, table_name, '') in locked or (table_schema, table_name, partition_name) in locked:
+            return 'locked'
+        if (table_schema, table_name, '') in running or (table_schema, table_name, partition_name) in running:
+            return 'running'
+        if partition_name == '' and any(key[:2] == (table_schema, table_name) for key in running):
+            # 整表搜集时，该表的任一分区正在搜集
+            return 'running'
+        return None
+
+
+# 对象region leader所在的TiKV store，用于将并发的统计信息搜集分散到不同的store上
+class StorePlacement:
+    """
+    Maps every table and partition to the TiKV stores holding its region leaders, loaded in bulk from
+    information_schema.tikv_region_status and information_schema.tikv_region_peers and cached until refresh().
+
+    AnalyzeQueue uses it to spread concurrent ANALYZEs across stores: score() returns how much an object would
+    compete with the running objects for the same stores, or None if one of its stores already runs
+    store_concurrency objects.
+    """
+
+    def __init__(self, pool: dbutils.pooled_db.PooledDB, store_concurrency=2, lookahead=32):
+        self.pool = pool
+        self.store_concurrency = max(store_concurrency, 1)
+        self.lookahead = max(lookahead, 1)
+        self._leaders = {}  # (table_schema, table_name, partition_name) -> {store_id: leader_share}
+
+    def refresh(self):
+        """
+        Reload the leader stores of all tables and partitions, returns (succ, error).
+        """
+        sql_text = """
+        select s.table_id,p.store_id,count(*) as leader_count
+        from information_schema.tikv_region_status s,
+             information_schema.tikv_region_peers p
+        where s.region_id = p.region_id
+          and p.is_leader = 1
+        group by s.table_id, p.store_id
+        """
+        conn = self.pool.connection()
+        try:
+            catalog, succ, msg = get_table_id_catalog(conn)
+            if not succ:
+                return False, msg
+            leader_counts = {}
+            cursor = conn.cursor()
+            try:
+                cursor.execute(sql_text)
+                for row in cursor:
+                    table_id, store_id, leader_count = row
+                    if table_id not in catalog:
+                        continue
+                    stores = leader_counts.setdefault(catalog[table_id], {})
+                    stores[store_id] = stores.get(store_id, 0) + leader_count
+            finally:
+                cursor.close()
+        except Exception as e:
+            return False, e
+        finally:
+            conn.close()
+        leaders = {}
+        for key, stores in leader_counts.items():
+            total = sum(stores.values())
+            leaders[key] = {store_id: leader_count / total for store_id, leader_count in stores.items()}
+        self._leaders = leaders
+        log.info(f"已加载{len(leaders)}个表(或分区)的region leader分布")
+        return True, None
+
+    def stores_of(self, analyze_object):
+        """
+        Returns {store_id: share of the object's region leaders on the store}, empty if unknown.
+        """
+        return self._leaders.get(tuple(analyze_object[:3]), {})
+
+    def score(self, analyze_object, store_running):
+        """
+        Returns the overlap of an object with the running objects (0 means no shared store),
+        or None if one of its stores already runs store_concurrency objects.
+        """
+        score = 0
+        for store_id, share in self.stores_of(analyze_object).items():
+            running = store_running.get(store_id, 0)
+            if running >= self.store_concurrency:
+                return None
+            score += share * running
+        return score
+
+
+# 清空所有catalog相关缓存，守护进程模式下定期刷新
+def reset_catalog_cache():
+    """
+    This function clears all the cached catalog query results, so that the next call reloads them.
+    """
+    global tables_with_blob_dict_cache, tables_with_blob_dict_executed
+    global partition_tables_cache, partition_tables_executed
+    global tables_rows_cache, table_rows_executed
+    global slow_log_tables_cache, table_id_catalog_cache, hot_table_scores_cache, table_name_index_cache
+    global read_hot_objects_cache, predicate_columns_cache
+    tables_with_blob_dict_cache = None
+    tables_with_blob_dict_executed = False
+    partition_tables_cache = None
+    partition_tables_executed = False
+    tables_rows_cache = {}
+    table_rows_executed = False
+    slow_log_tables_cache = None
+    table_id_catalog_cache = None
+    hot_table_scores_cache = None
+    table_name_index_cache = None
+    read_hot_objects_cache = None
+    predicate_columns_cache = None
+
+
+# 获取表id(包括分区id)到对象的映射
+def get_table_id_catalog(conn: pymysql.connect):
+    """
+    This function maps every table id and partition id to the object it belongs to.
+
+    Parameters:
+    conn (pymysql.connect): The database connection object.
+
+    Returns:
+    tuple: A tuple containing the following elements:
+        - dict: A dictionary where the key is the tidb table id (or partition id) and the value is a tuple (table_schema, table_name, partition_name). partition_name is '' for tables.
+        - bool: A boolean value indicating whether the operation was successful.
+        - None/Exception: If an error occurred during the operation, it returns the exception; otherwise, it returns None.
+    """
+    global table_id_catalog_cache
+    if table_id_catalog_cache is not None:
+        return table_id_catalog_cache, True, None
+    result = {}
+    # 表和分区数可达百万级，按列读取不为每行构造元组，重复的模式名只保留一份(字符串驻留)，缓存的映射占用更少内存
+    cursor = conn.cursor(pymysql.cursors.ColumnarCursor)
+    try:
+        cursor.execute("select tidb_table_id,table_schema,table_name from information_schema.tables where table_type='BASE TABLE'")
+        table_ids, table_schemas, table_names = cursor.fetchcolumns().values()
+        for table_id, table_schema, table_name in zip(table_ids, table_schemas, table_names):
+            result[table_id] = (table_schema, table_name, '')
+        cursor.execute("""
+        select tidb_partition_id,table_schema,table_name,partition_name from information_schema.partitions where partition_name is not null
+        """)
+        partition_ids, table_schemas, table_names, partition_names = cursor.fetchcolumns().values()
+        for partition_id, table_schema, table_name, partition_name in zip(partition_ids, table_schemas, table_names,
+                                                                          partition_names):
+            result[partition_id] = (table_schema, table_name, partition_name)
+    except Exception as e:
+        return None, False, e
+    finally:
+        cursor.close()
+    table_id_catalog_cache = result
+    return table_id_catalog_cache, True, None
+
+
+# 表名解析索引，将SQL中的表引用解析为数据库中实际存在的表
+class TableNameIndex:
+    """
+    Resolves table references found in statements to the tables of the catalog.
+
+    The index holds a (schema, name) -> table id map and a name -> schemas multimap, both keyed by lower case
+    names since table names are compared case-insensitively. A reference is resolved with its explicit qualifier
+    or the db of the statement; a bare name without db is resolved only when exactly one schema has a table with
+    that name, so with many schemas holding the same table name no schema is guessed. Every lookup is O(1).
+    """
+
+    def __init__(self, catalog):
+        """
+        :param catalog: get_table_id_catalog的结果，table id -> (table_schema, table_name, partition_name)
+        """
+        self._ids = {}
+        self._tables = {}
+        self._schemas = {}
+        for table_id, (table_schema, table_name, partition_name) in catalog.items():
+            if partition_name:
+                continue
+            key = (table_schema.lower(), table_name.lower())
+            self._ids[key] = table_id
+            self._tables[key] = (table_schema, table_name)
+            self._schemas.setdefault(key[1], []).append(key[0])
+
+    def __len__(self):
+        return len(self._tables)
+
+    def resolve(self, table_schema, table_name):
+        """
+        返回数据库中实际的(table_schema, table_name)，table_schema为空时仅在表名唯一时解析，无法解析返回None
+        """
+        name = table_name.lower()
+        if table_schema:
+            return self._tables.get((table_schema.lower(), name))
+        schemas = self._schemas.get(name)
+        if schemas is None or len(schemas) != 1:
+            return None
+        return self._tables[(schemas[0], name)]
+
+    def schemas(self, table_name):
+        """
+        返回包含该表名的所有模式名(小写)
+        """
+        return list(self._schemas.get(table_name.lower(), []))
+
+    def table_id(self, table_schema, table_name):
+        return self._ids.get((table_schema.lower(), table_name.lower()))
+
+
+# 获取表名解析索引，结果缓存，守护进程模式下随catalog一起刷新
+def get_table_name_index(conn: pymysql.connect):
+    """
+    This function builds the TableNameIndex of the catalog returned by get_table_id_catalog.
+
+    Parameters:
+    conn (pymysql.connect): The database connection object.
+
+    Returns:
+    tuple: A tuple containing the following elements:
+        - TableNameIndex: The resolution index.
+        - bool: A boolean value indicating whether the operation was successful.
+        - None/Exception: If an error occurred during the operation, it returns the exception; otherwise, it returns None.
+    """
+    global table_name_index_cache
+    if table_name_index_cache is not None:
+        return table_name_index_cache, True, None
+    catalog, succ, msg = get_table_id_catalog(conn)
+    if not succ:
+        return None, False, msg
+    table_name_index_cache = TableNameIndex(catalog)
+    return table_name_index_cache, True, None
+
+
+# 根据缓存的catalog信息构造单个待搜集对象
+def build_analyze_object(conn: pymysql.connect, table_schema: str, table_name: str, partition_name: str):
+    """
+    This function builds the (table_schema, table_name, partition_name, table_rows, col_list, sql_text) tuple of
+    a single object from the cached catalog, excluding large columns as gen_need_analyze_sqls does.
+    """
+    col_list = False
+    tables_with_blob_dict, succ, msg = get_tables_with_blob_dict(conn)
+    if succ and (table_schema, table_name) in tables_with_blob_dict:
+        col_list = tables_with_blob_dict[(table_schema, table_name)]
+    tables_rows_dict, succ, msg = get_all_tables_rows(conn)
+    table_rows = tables_rows_dict.get((table_schema, table_name), 0) if succ else 0
+    col_list, predicate = get_analyze_columns(conn, table_schema, table_name, col_list)
+    col_list, sql_text = gen_analyze_sql(table_schema, table_name, partition_name, col_list, predicate)
+    return table_schema, table_name, partition_name, table_rows, col_list, sql_text
+
+
+# 获取守护进程模式下轮询的初始水位线
+def get_poll_watermarks(conn: pymysql.connect):
+    """
+    This function returns the current max version of mysql.stats_meta, and the current max end_time of
+    mysql.analyze_jobs with the ids of the failed jobs that ended at that time.
 
-                # todo 添加exector中队列深度，需要采用生产者消费者模式结合queue来保证未执行的SQL队列不过大
-                exector.submit(to_exec, pool, sql_text, table_schema, table_name, table_rows, start_time, end_time)
+    Jobs do not finish in id order (parallel analyze, auto analyze), so the failed jobs are polled by end_time: a job
+    still running at poll time is seen when it fails later. end_time only has second precision, the ids already seen
+    at the watermark are kept to poll that second again without reporting them twice.
+
+    Returns:
+    tuple: ((stats_meta_version, analyze_jobs_end_time, analyze_jobs_ids), succ, error)
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("select ifnull(max(version),0) from mysql.stats_meta")
+        stats_meta_version = cursor.fetchone()[0]
+        cursor.execute("select ifnull(max(end_time),now()) from mysql.analyze_jobs")
+        analyze_jobs_end_time = cursor.fetchone()[0]
+        cursor.execute("select id from mysql.analyze_jobs where state = 'failed' and end_time = %s",
+                       (analyze_jobs_end_time,))
+        analyze_jobs_ids = frozenset(row[0] for row in cursor)
+    except Exception as e:
+        return None, False, e
+    finally:
+        cursor.close()
+    return (stats_meta_version, analyze_jobs_end_time, analyze_jobs_ids), True, None
+
+
+# 根据stats_meta判断表(或分区)的统计信息是否需要重新搜集，算法与show stats_healthy一致
+def is_stats_meta_unhealthy(modify_count, row_count, snapshot, threshold=90):
+    if snapshot == 0:
+        # 从来没搜集过统计信息
+        return True
+    if modify_count == 0:
+        return False
+    if modify_count >= row_count:
+        return True
+    return (1 - modify_count / row_count) * 100 < threshold
+
+
+# 轮询stats_meta和analyze_jobs中水位线之后的变化
+def poll_changed_objects(conn: pymysql.connect, watermarks, threshold=90):
+    """
+    This function polls the cheap change signals since the last watermarks: mysql.stats_meta rows with a newer
+    version, and jobs of mysql.analyze_jobs that failed since the last poll (by end_time, see get_poll_watermarks).
+
+    Parameters:
+    conn (pymysql.connect): The database connection object.
+    watermarks (tuple): (stats_meta_version, analyze_jobs_end_time, analyze_jobs_ids) returned by the last poll.
+    threshold (int, optional): The health score threshold. Defaults to 90.
+
+    Returns:
+    tuple: A tuple containing the following elements:
+        - tuple: (stale, healthy, watermarks). stale and healthy are lists of (table_schema, table_name, partition_name), watermarks are the new watermarks.
+        - bool: A boolean value indicating whether the operation was successful.
+        - None/Exception: If an error occurred during the operation, it returns the exception; otherwise, it returns None.
+    """
+    stats_meta_version, analyze_jobs_end_time, analyze_jobs_ids = watermarks
+    seen_ids = set(analyze_jobs_ids)
+    changed_ids = {}  # table_id -> 是否需要搜集
+    failed_objects = []
+    # 每次轮询执行相同的语句，使用服务端预编译语句，连接上缓存的语句可直接execute
+    cursor = conn.cursor(pymysql.cursors.PreparedCursor)
+    try:
+        cursor.execute("""
+        select version,table_id,modify_count,count,snapshot from mysql.stats_meta where version > %s order by version
+        """, (stats_meta_version,))
+        for row in cursor:
+            version, table_id, modify_count, row_count, snapshot = row
+            changed_ids[table_id] = is_stats_meta_unhealthy(modify_count, row_count, snapshot, threshold)
+            stats_meta_version = max(stats_meta_version, version)
+        cursor.execute("""
+        select id,table_schema,table_name,partition_name,end_time from mysql.analyze_jobs
+        where state = 'failed' and end_time >= %s order by end_time
+        """, (analyze_jobs_end_time,))
+        for row in cursor:
+            job_id, table_schema, table_name, partition_name, end_time = row
+            if end_time == analyze_jobs_end_time and job_id in seen_ids:
+                continue
+            failed_objects.append((table_schema, table_name, partition_name or ''))
+            if end_time > analyze_jobs_end_time:
+                analyze_jobs_end_time = end_time
+                seen_ids = set()
+            seen_ids.add(job_id)
+    except Exception as e:
+        return None, False, e
+    finally:
+        cursor.close()
+    catalog, succ, msg = get_table_id_catalog(conn)
+    if not succ:
+        return None, False, msg
+    if any(table_id not in catalog for table_id in changed_ids):
+        # 有新建的表，刷新catalog
+        reset_catalog_cache()
+        catalog, succ, msg = get_table_id_catalog(conn)
+        if not succ:
+            return None, False, msg
+    partition_tables_dict, succ, msg = get_all_partition_tables(conn)
+    if not succ:
+        return None, False, msg
+    stale, healthy = [], []
+    for table_id, unhealthy in changed_ids.items():
+        if table_id not in catalog:
+            continue
+        (stale if unhealthy else healthy).append(catalog[table_id])
+    stale.extend(failed_objects)
+    # 分区表只搜集分区，会自动做global merge stats
+    stale = [obj for obj in stale if not (obj[2] == '' and partition_tables_dict.get((obj[0], obj[1]), False))]
+    return (stale, healthy, (stats_meta_version, analyze_jobs_end_time, frozenset(seen_ids))), True, None
+
+
+# 守护进程模式，常驻内存持续增量调度
+def run_daemon(pool: dbutils.pooled_db.PooledDB, start_time=None, end_time=None, slow_query_table_first=False,
+               order=True, preview=False, parallel=1, poll_interval=60, catalog_refresh_interval=3600,
+               threshold=90, coordinator=None, analyze_queue=None, status_snapshot=None, defer_running=False):
+    """
+    This function runs tidb_analyze as a long-running daemon.
+
+    After one full discovery, it keeps the connection pool and the catalog caches warm and polls the cheap
+    change signals (see poll_changed_objects) every poll_interval seconds inside the allowed time window.
+    Newly stale objects are fed into the live priority queue consumed by the analyze workers, objects that
+    became healthy again (for example analyzed by TiDB auto analyze) are dropped from the queue.
+    The watermarks only advance when a poll succeeds, so changes outside the time window are picked up
+    by the first poll of the next window.
+
+    Parameters:
+    pool (dbutils.pooled_db.PooledDB): The database connection pool.
+    start_time (str, optional): The start of the allowed time window.
+    end_time (str, optional): The end of the allowed time window.
+    slow_query_table_first (bool, optional): Prioritize tables that appear in the slow query log.
+    order (bool, optional): Order by the number of rows in the table.
+    preview (bool, optional): Only log the statements.
+    parallel (int, optional): The number of analyze workers.
+    poll_interval (int, optional): Seconds between two polls. Defaults to 60.
+    catalog_refresh_interval (int, optional): Seconds between two catalog cache refreshes. Defaults to 3600.
+    threshold (int, optional): The health score threshold. Defaults to 90.
+    coordinator (LeaseCoordinator, optional): Share the work with other instances through leases.
+    analyze_queue (AnalyzeQueue, optional): The live priority queue, a default one is created if None.
+    status_snapshot (AnalyzeStatusSnapshot, optional): Skip locked objects and objects that are already being analyzed.
+    defer_running (bool, optional): Put objects that are already being analyzed back into the queue instead of dropping them.
+    """
+    conn = pool.connection()  # 轮询专用连接，常驻
+    # 先取水位线再做全量发现，保证全量发现期间的变化不会丢失
+    watermarks, succ, msg = get_poll_watermarks(conn)
+    if not succ:
+        log.error(f"获取轮询水位线失败: {msg}")
+        return False
+    result, succ, msg = gen_need_analyze_sqls(conn, slow_query_table_first, order)
+    if not succ:
+        return False
+    log.info(f"守护进程模式启动，需要做统计信息搜集的对象数为: {len(result)}，轮询间隔: {poll_interval}秒")
+    hot_tables = get_hot_tables(conn, slow_query_table_first)
+    if analyze_queue is None:
+        analyze_queue = AnalyzeQueue(parallel)
+    for analyze_object in result:
+        analyze_queue.put(analyze_object, get_analyze_priority(analyze_object, hot_tables, order))
+    if coordinator is not None:
+        coordinator.start(analyze_queue)
+    stop_event = threading.Event()
+    start_analyze_workers(pool, analyze_queue, parallel, start_time, end_time, preview, stop_event, daemon=True,
+                          coordinator=coordinator, status_snapshot=status_snapshot, defer_running=defer_running)
+    catalog_loaded_at = time.time()
+    try:
+        while not stop_event.wait(poll_interval):
+            if not in_time_range(start_time, end_time):
+                continue
+            if time.time() - catalog_loaded_at >= catalog_refresh_interval:
+                reset_catalog_cache()
+                catalog_loaded_at = time.time()
+                if analyze_queue.placement is not None:
+                    succ, msg = analyze_queue.placement.refresh()
+                    if not succ:
+                        log.warning(f"刷新region leader分布失败: {msg}")
+                hot_tables = get_hot_tables(conn, slow_query_table_first)
+            polled, succ, msg = poll_changed_objects(conn, watermarks, threshold)
+            if not succ:
+                log.warning(f"轮询统计信息变化失败: {msg}")
+                continue
+            stale, healthy, watermarks = polled
+            for key in healthy:
+                if analyze_queue.discard(key):
+                    log.debug(f"对象统计信息已恢复健康，移出队列: {key}")
+            queued = 0
+            for table_schema, table_name, partition_name in stale:
+                analyze_object = build_analyze_object(conn, table_schema, table_name, partition_name)
+                if analyze_queue.put(analyze_object, get_analyze_priority(analyze_object, hot_tables, order)):
+                    queued += 1
+            if queued:
+                log.info(f"新增需要做统计信息搜集的对象数为: {queued}，当前队列长度: {analyze_queue.qsize()}")
+    finally:
+        stop_event.set()
+        analyze_queue.close()
+        if coordinator is not None:
+            coordinator.stop()
+        conn.close()
     return True
 
 
+
 def in_time_range(start_time, end_time):
     """
     This function checks if the current time falls within a specified time range.
@@ -745,34 +3030,191 @@ def in_time_range(start_time, end_time):
             return False
 
 
-# todo 优化正则表达式，支持获取模式名
-def get_all_tablename(sql_text):
+# SQL词法单元：注释、字符串、空白直接跳过，只保留标识符(含反引号)和结构性符号
+_SQL_TOKEN_RE = re.compile(r"""
+    (?P<skip>\s+|--[^\n]*|\#[^\n]*|/\*.*?\*/|'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+  | `(?P<quoted>(?:[^`]|``)*)`
+  | (?P<word>[\w$]+)
+  | (?P<punct>[.,();@])
+""", re.S | re.X)
+
+# 表引用之后可能出现的关键字，这些词不会被当作表名或别名
+_SQL_KEYWORDS = frozenset("""
+    ALL AND ANY AS ASC BY CROSS DEFAULT DELETE DESC DUAL ELSE END EXCEPT EXISTS FETCH FOR FORCE FROM FULL GROUP
+    HAVING IGNORE IN INDEX INNER INSERT INTERSECT INTO IS JOIN KEY LATERAL LEFT LIMIT LOCK LOW_PRIORITY MINUS
+    NATURAL NOT NULL OF OFFSET ON OR ORDER OUTER PARTITION PROCEDURE QUICK REPLACE RETURNING RIGHT ROWS SELECT SET
+    SOME STRAIGHT_JOIN TABLE TABLESAMPLE THEN UNION UPDATE USE USING VALUE VALUES WHEN WHERE WINDOW WITH
+""".split())
+
+# 语法中带from的函数，如extract(year from d)，其中的from不是表引用
+_SQL_FROM_FUNCTIONS = frozenset(("EXTRACT", "TRIM", "SUBSTRING", "SUBSTR", "MID"))
+
+
+def _tokenize_sql(sql_text):
+    """
+    一次扫描把sql切分为(kind, value)序列，kind为word/quoted/punct
+    """
+    tokens = []
+    for m in _SQL_TOKEN_RE.finditer(sql_text):
+        kind = m.lastgroup
+        if kind == "skip":
+            continue
+        value = m.group(kind)
+        if kind == "quoted":
+            value = value.replace("``", "`")
+        tokens.append((kind, value))
+    return tokens
+
+
+def _is_identifier(token):
+    kind, value = token
+    return kind == "quoted" or (kind == "word" and value.upper() not in _SQL_KEYWORDS)
+
+
+def _skip_table_hints(tokens, i):
+    """
+    跳过表引用后的partition(...)、index hint以及TiDB的as of timestamp，返回下一个位置
+    """
+    n = len(tokens)
+    while i < n and tokens[i][0] == "word":
+        word = tokens[i][1].upper()
+        if word == "PARTITION" or word in ("USE", "FORCE", "IGNORE"):
+            # 跳到括号结束
+            while i < n and tokens[i] != ("punct", "("):
+                i += 1
+            depth = 0
+            while i < n:
+                if tokens[i] == ("punct", "("):
+                    depth += 1
+                elif tokens[i] == ("punct", ")"):
+                    depth -= 1
+                    if depth == 0:
+                        break
+                i += 1
+            i += 1
+        elif word == "AS" and i + 1 < n and tokens[i + 1][0] == "word" and tokens[i + 1][1].upper() == "OF":
+            # as of timestamp <expr>，跳到同层的逗号或关键字
+            i += 2
+            depth = 0
+            while i < n:
+                token = tokens[i]
+                if token == ("punct", "("):
+                    depth += 1
+                elif token == ("punct", ")"):
+                    if depth == 0:
+                        break
+                    depth -= 1
+                elif depth == 0 and (token in (("punct", ","), ("punct", ";")) or
+                                     (token[0] == "word" and token[1].upper() in _SQL_KEYWORDS)):
+                    break
+                i += 1
+        else:
+            break
+    return i
+
+
+def _parse_table_refs(tokens, i, result, after_factor=False):
+    """
+    从位置i开始解析以逗号分隔的表引用列表，解析到的(schema, table)追加到result，未限定模式名的schema为None
+    :param after_factor: 为True时表示i位于一个派生表(子查询)的右括号之后，只需跳过别名后继续解析
+    :return: (next_index, derived_at) derived_at为列表中遇到的派生表左括号位置，没有则为-1
+    """
+    n = len(tokens)
+    # update low_priority ignore t
+    while not after_factor and i < n and tokens[i][0] == "word" and tokens[i][1].upper() in ("LOW_PRIORITY", "IGNORE"):
+        i += 1
+    while i < n:
+        if not after_factor:
+            if tokens[i] == ("punct", "("):
+                return i, i
+            if not _is_identifier(tokens[i]):
+                return i, -1
+            schema, name = None, tokens[i][1]
+            if i + 2 < n and tokens[i + 1] == ("punct", ".") and tokens[i + 2][0] in ("word", "quoted"):
+                schema, name = name, tokens[i + 2][1]
+                i += 3
+            else:
+                i += 1
+            result.append((schema, name))
+        after_factor = False
+        # 别名：[as] alias
+        if i + 1 < n and tokens[i][0] == "word" and tokens[i][1].upper() == "AS" and _is_identifier(tokens[i + 1]):
+            i += 2
+        elif i < n and _is_identifier(tokens[i]):
+            i += 1
+        i = _skip_table_hints(tokens, i)
+        if i < n and tokens[i] == ("punct", ","):
+            i += 1
+            continue
+        return i, -1
+    return i, -1
+
+
+def get_all_tablename(sql_text, default_db=None):
     """
-    This function extracts all table names from a given SQL query.
+    This function extracts all table references from a given SQL query.
+
+    The query is tokenized in a single pass (comments and string literals are skipped, backtick quoted identifiers
+    are unquoted), then the token stream is walked once to collect the table factors that follow FROM, JOIN and
+    UPDATE, including comma separated joins, derived tables and parenthesized joins. Aliases, CTE names and the
+    FROM inside functions such as extract(year from d) are not reported as tables.
 
     Parameters:
     sql_text (str): The SQL query from which to extract table names.
+    default_db (str): The current database of the statement (the `db` column of slow_query), used as schema
+        of unqualified table names.
 
     Returns:
-    list: A list of table names extracted from the SQL query.
-
-    Note:
-    The function uses regular expressions to find the table names. It looks for patterns that match SQL syntax for referencing tables.
+    list: A list of (schema, table) tuples in order of appearance, schema is default_db for unqualified names.
     """
+    tokens = _tokenize_sql(sql_text)
     tablist = []
-    # pattern_text='from\s+?("?(?P<first>\w+?)\s*?"?\.)?"?(?P<last>\w+) *"?'
-    pattern_text = '(from|delete\s+from|update)\s+("?\w+"?\.)?"?(?P<last>\w+)"?'
-    while len(sql_text) > 0:
-        pattern_tab = re.search(pattern_text, sql_text, re.I)
-        if pattern_tab is not None:
-            tablist.append(pattern_tab.group("last"))
-            sql_text = sql_text[pattern_tab.end():]
-        else:
-            return tablist
-    return tablist
+    cte_names = set()
+    # 每层括号是否为函数调用(True)、派生表(derived)或普通括号(False)
+    paren_stack = []
+    derived_at = -1
+    n = len(tokens)
+    i = 0
+    while i < n:
+        kind, value = tokens[i]
+        if kind == "punct":
+            if value == "(":
+                if i == derived_at:
+                    paren_stack.append("derived")
+                    # (t1 join t2 on ...)形式的括号join
+                    if i + 1 < n and _is_identifier(tokens[i + 1]):
+                        i, derived_at = _parse_table_refs(tokens, i + 1, tablist)
+                        continue
+                else:
+                    prev = tokens[i - 1] if i else None
+                    paren_stack.append(prev is not None and prev[0] == "word" and prev[1].upper() in _SQL_FROM_FUNCTIONS)
+            elif value == ")" and paren_stack:
+                if paren_stack.pop() == "derived":
+                    i, derived_at = _parse_table_refs(tokens, i + 1, tablist, after_factor=True)
+                    continue
+            i += 1
+            continue
+        if kind == "word":
+            word = value.upper()
+            prev_word = tokens[i - 1][1].upper() if i and tokens[i - 1][0] == "word" else None
+            if (word in ("FROM", "JOIN", "STRAIGHT_JOIN") and not (paren_stack and paren_stack[-1] is True)) or \
+                    (word == "UPDATE" and prev_word not in ("FOR", "KEY")):
+                i, derived_at = _parse_table_refs(tokens, i + 1, tablist)
+                continue
+            if word == "AS" and i + 1 < n and tokens[i + 1] == ("punct", "(") and i:
+                # with cte as (...) 或 with cte(c1,c2) as (...)
+                j = i - 1
+                if tokens[j] == ("punct", ")"):
+                    while j > 0 and tokens[j] != ("punct", "("):
+                        j -= 1
+                    j -= 1
+                if j >= 0 and tokens[j][0] in ("word", "quoted"):
+                    cte_names.add(tokens[j][1].lower())
+        i += 1
+    return [(schema if schema is not None else default_db, name) for schema, name in tablist
+            if not (schema is None and name.lower() in cte_names)]
 
 
-# 从慢日志表中获取SQL语句中的表名
 def get_all_tables_from_database(conn: pymysql.connect):
     """
     This function retrieves all table names from the database.
@@ -789,37 +3231,18 @@ def get_all_tables_from_database(conn: pymysql.connect):
     Raises:
     Exception: An exception is raised if there is an error executing the SQL query.
     """
-    sql_text = """
-    select user,db,query_time,Query from (select user,db,query_time,Query,row_number() over (partition by digest) as nbr from INFORMATION_SCHEMA.slow_query where is_internal=0 and  `Time` > DATE_SUB(NOW(),INTERVAL 1 DAY) limit 10000)a where nbr = 1
-    """
+    sql_text = "select table_schema,table_name from information_schema.tables where table_type='BASE TABLE'"
     cursor = conn.cursor()
     result = []  # 返回(db,table_name)
     try:
         cursor.execute(sql_text)
         for row in cursor:
-            user, db, query_time, query = row
-            tablist = get_all_tablename(query)
-            # 对tablist去重
-            tablist = list(set(tablist))
-            for table_name in tablist:
-                result.append(table_name)
+            table_schema, table_name = row
+            result.append((table_schema, table_name))
     except Exception as e:
         return None, False, e
     finally:
         cursor.close()
-    # 对result去重
-    result = list(set(result))
-    # 从数据库中获取所有表名
-    all_tables, success, error = get_all_tables_from_database(conn)
-    if not success:
-        return None, False, error
-    # 将all_tables转换为字典
-    all_tables_dict = {}
-    # 如果表名重复，以最后一次为准
-    for table_schema, table_name in all_tables:
-        all_tables_dict[table_name] = table_schema
-    # 对result进行过滤，只保留数据库中存在的表模式和表名
-    result = [(all_tables_dict[table_name], table_name) for table_name in result if table_name in all_tables_dict]
     return result, True, None
 
 
@@ -902,10 +3325,17 @@ def get_help_description():
     5、对于分区表，如果只是部分分区失败则只搜集失败的分区，否则搜集整个表
     6、排除blob、clob、lob、text、midieum字段类型（这些字段不做统计信息搜集）
     7、按照table_rows升序搜集
-    8、待统计信息表如果在最近慢日志中出现过，则优先搜集（优先级大于table_rows）
+    8、待统计信息表如果在最近慢日志中出现过，则优先搜集（优先级大于table_rows），其中慢查询使用pseudo或过期统计信息(Stats列)的表按慢查询耗时最先搜集
     9、规定统计信息搜集时间窗口
 扩展功能：
-    优先搜集慢查询中的表
+    优先搜集慢查询中的表(--hot-source可选择从statements_summary获取)
+    守护进程模式(--daemon)，持续增量搜集
+    多实例协同(--coordinate)，多个实例通过租约表分担搜集任务
+    跳过正在被TiDB搜集(show analyze status)和统计信息已锁定(show stats_locked)的对象
+    按TiKV store分散并发搜集(--store-aware)
+    优先搜集TiKV读流量大的表(--read-hot-first)
+    只搜集查询条件中使用过的列和索引列(--analyze-columns predicate/used)
+    跨机房等慢速链路上使用压缩协议传输结果(--compress)
 版本要求
     tidb.version >= 6.1.0"""
 
@@ -929,8 +3359,58 @@ if __name__ == '__main__':
                         help="统计信息允许的结束时间窗口,生产环境推荐设置为06:00,表示次日06点后不会执行统计信息搜集语句，但不会杀掉正在执行的最后一个统计信息语句",
                         required=False)
     parser.add_argument('--parallel', help="统计信息搜集并发数，最多可并发10个", type=int, default=1)
-    parser.add_argument('-t', '--timeout', help="整个统计信息搜集最大时间，超过该时间则超时退出,单位为秒",
+    parser.add_argument('-t', '--timeout', help="整个统计信息搜集最大时间，超过该时间则超时退出,单位为秒，守护进程模式下不生效",
                         default=12 * 3600, type=int)
+    parser.add_argument('--daemon', help="守护进程模式，常驻内存，在时间窗口内轮询stats_meta和analyze_jobs的变化并持续增量搜集",
+                        action='store_true')
+    parser.add_argument('--poll-interval', help="守护进程模式下轮询变化的间隔，单位为秒", type=int, default=60)
+    parser.add_argument('--catalog-refresh-interval', help="守护进程模式下刷新表结构等缓存的间隔，单位为秒",
+                        type=int, default=3600)
+    parser.add_argument('--small-rows', help="记录数小于该值的对象为小对象，小对象有预留的执行槽位", type=int,
+                        default=1000000)
+    parser.add_argument('--large-rows', help="记录数大于等于该值的对象为大对象，大对象同时执行数受--large-slots限制",
+                        type=int, default=100000000)
+    parser.add_argument('--fast-slots', help="为小对象预留的执行槽位数，小对象队列为空时其他对象可使用", type=int,
+                        default=1)
+    parser.add_argument('--large-slots', help="大对象最多同时占用的执行槽位数，默认为并发数的一半，其他对象队列为空时不限制",
+                        type=int)
+    parser.add_argument('--store-aware', help="按region leader所在的TiKV store分散并发搜集，避免多个搜集任务集中在相同的store上",
+                        action='store_true')
+    parser.add_argument('--store-concurrency', help="开启--store-aware时，每个TiKV store上同时执行的搜集任务上限",
+                        type=int, default=2)
+    parser.add_argument('--running-analyze', help="对象正在被TiDB(包括自动搜集)搜集统计信息时的处理方式: drop跳过，defer延后重试",
+                        choices=['drop', 'defer'], default='drop')
+    parser.add_argument('--status-refresh-interval', help="正在执行的统计信息搜集任务和锁定统计信息的表的刷新间隔，单位为秒",
+                        type=int, default=30)
+    parser.add_argument('--coordinate', help="多实例协同模式，多个tidb_analyze实例通过目标集群中的租约表分担搜集任务，避免重复搜集",
+                        action='store_true')
+    parser.add_argument('--lease-table', help="多实例协同使用的租约表", default='tidb_analyze.analyze_lease')
+    parser.add_argument('--lease-ttl', help="租约时长，单位为秒，执行期间会自动续约", type=int, default=300)
+    parser.add_argument('--lease-batch', help="每次批量申请租约的对象数", type=int, default=10)
+    parser.add_argument('--hot-source', help="--slow-log-first使用的热点表来源: slow_query解析当前tidb节点的慢日志SQL文本，"
+                                             "cluster_slow_query按实例和时间片并行读取整个集群的慢日志，"
+                                             "statements_summary读取服务端按表聚合的语句摘要，"
+                                             "slow_log_file解析--slow-log-file指定的本地慢日志文件",
+                        choices=['slow_query', 'cluster_slow_query', 'statements_summary', 'slow_log_file'],
+                        default='slow_query')
+    parser.add_argument('--slow-log-file', help="--hot-source slow_log_file时解析的本地慢日志文件，支持通配符，可指定多次",
+                        action='append', default=[])
+    parser.add_argument('--slow-log-slice-minutes', help="--hot-source cluster_slow_query时每个时间片的长度，单位为分钟",
+                        type=int, default=60)
+    parser.add_argument('--analyze-columns', help="搜集哪些列的统计信息: all除大字段外的所有列，"
+                                                 "predicate使用analyze ... predicate columns，"
+                                                 "used只搜集查询条件中使用过的列(mysql.column_stats_usage)和索引列",
+                        choices=['all', 'predicate', 'used'], default='all')
+    parser.add_argument('--read-hot-first', help="按TiKV读热点(tidb_hot_regions)的读流量优先搜集读流量大的表(分区)",
+                        action='store_true')
+    parser.add_argument('--slow-log-state', help="慢日志水位线和表热度的状态文件，下次运行只扫描新的慢日志，设置为空字符串时不保存",
+                        default='~/.tidb_analyze/slow_log_state.db')
+    parser.add_argument('--hotness-half-life', help="表热度按指数衰减的半衰期，单位为小时", type=float, default=24)
+    parser.add_argument('--digest-cache', help="慢日志SQL digest解析结果的缓存文件，跨运行复用，设置为空字符串时只使用内存缓存",
+                        default='~/.tidb_analyze/digest_tables.db')
+    parser.add_argument('--compress', help="连接使用MySQL压缩协议: zlib，zstd(需要安装zstandard模块)，"
+                                           "tidb不支持zstd时使用zlib，都不支持时不压缩",
+                        choices=['none', 'zlib', 'zstd'], default='none')
     args = parser.parse_args()
     parallel = 10 if args.parallel > 10 else args.parallel
     log.basicConfig(level=log.INFO,
@@ -940,8 +3420,15 @@ if __name__ == '__main__':
         args.password = getpass.getpass("password:")
     try:
         # 创建数据库连接池
-        pool = PooledDB(creator=pymysql, maxconnections=parallel + 1, blocking=True, host=args.host, port=args.port,
-                        user=args.user, password=args.password, database=args.database)
+        # 搜集线程各占一个连接(包括搜集前刷新analyze status快照)，另外预留控制面查询的连接，避免其等待长时间运行的analyze：
+        # 主线程(守护进程模式下为轮询线程，常驻一个连接)、轮询线程持有连接时刷新region leader分布、
+        # 并行读取cluster_slow_query的线程和租约续约线程
+        collector_connections = parallel if args.slow_log_first and args.hot_source == 'cluster_slow_query' else 0
+        maxconnections = (parallel + 1 + (1 if args.store_aware else 0) + collector_connections
+                          + (1 if args.coordinate else 0))
+        pool = PooledDB(creator=pymysql, maxconnections=maxconnections, blocking=True, host=args.host, port=args.port,
+                        user=args.user, password=args.password, database=args.database,
+                        compress=None if args.compress == 'none' else args.compress)
         # 判断当前tidb版本是否大于6.1.0，如果小于6.1.0，那么不支持analyze table语法
         tidb_version = get_tidb_version(pool.connection())
         log.info(f"当前tidb版本为: {tidb_version}")
@@ -952,11 +3439,52 @@ if __name__ == '__main__':
         preview = False
         if args.slow_log_first:
             slow_query_table_first = True
+            hot_tables_source = args.hot_source
+            slow_log_state = SlowLogState(os.path.expanduser(args.slow_log_state) if args.slow_log_state else None,
+                                          half_life_hours=args.hotness_half_life)
+            if args.hot_source == 'cluster_slow_query':
+                # 并行读取使用连接池中为其预留的连接，不等待搜集线程释放连接
+                slow_log_collector = ClusterSlowLogCollector(pool, slice_minutes=args.slow_log_slice_minutes,
+                                                             parallel=parallel)
+            elif args.hot_source == 'slow_log_file':
+                if not args.slow_log_file:
+                    log.error("--hot-source slow_log_file需要通过--slow-log-file指定慢日志文件")
+                    exit(1)
+                slow_log_collector = SlowLogFileReader(args.slow_log_file)
+            slow_log_digest_cache = DigestTableCache(
+                os.path.expanduser(args.digest_cache) if args.digest_cache else None)
         if args.preview:
             preview = True
+        read_hot_first = args.read_hot_first
+        analyze_columns_mode = args.analyze_columns
+        coordinator = None
+        if args.coordinate and not preview:
+            coordinator = LeaseCoordinator(TiDBLeaseBackend(pool, args.lease_table), ttl=args.lease_ttl,
+                                           batch_size=args.lease_batch)
+        placement = None
+        if args.store_aware:
+            placement = StorePlacement(pool, store_concurrency=args.store_concurrency)
+            succ, msg = placement.refresh()
+            if not succ:
+                log.warning(f"获取region leader分布失败，不按store分散并发: {msg}")
+                placement = None
+        analyze_queue = AnalyzeQueue(parallel, small_rows=args.small_rows, large_rows=args.large_rows,
+                                     fast_slots=args.fast_slots, large_slots=args.large_slots, placement=placement)
+        status_snapshot = AnalyzeStatusSnapshot(pool, refresh_interval=args.status_refresh_interval)
+        defer_running = args.running_analyze == 'defer'
         t1 = time.time()
-        with_timeout(args.timeout, do_analyze, pool, start_time=args.start_time, end_time=args.end_time,
-                     slow_query_table_first=slow_query_table_first, order=True, preview=preview, parallel=parallel)
+        if args.daemon:
+            # 守护进程模式不设置整体超时(alarm(0))
+            with_timeout(0, run_daemon, pool, start_time=args.start_time, end_time=args.end_time,
+                         slow_query_table_first=slow_query_table_first, order=True, preview=preview,
+                         parallel=parallel, poll_interval=args.poll_interval,
+                         catalog_refresh_interval=args.catalog_refresh_interval, coordinator=coordinator,
+                         analyze_queue=analyze_queue, status_snapshot=status_snapshot, defer_running=defer_running)
+        else:
+            with_timeout(args.timeout, do_analyze, pool, start_time=args.start_time, end_time=args.end_time,
+                         slow_query_table_first=slow_query_table_first, order=True, preview=preview,
+                         parallel=parallel, coordinator=coordinator, analyze_queue=analyze_queue,
+                         status_snapshot=status_snapshot, defer_running=defer_running)
         log.info(f"总耗时: {round(time.time() - t1, 2)}秒")
         pool.close()
     except Exception as e: